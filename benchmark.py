@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import gc
+import hub
+import time
+
+import color_sensor, motor, motor_pair, runloop
+from hub import light_matrix, motion_sensor, port
+
+
+# CONSTANTS
+#----------------------------------------
+
+# Put the robot on a stand: the drive motors are commanded at velocity 0
+BENCHMARK_ITERATIONS = 500
+# fewer calls for the allocation pass, garbage collection is off while it runs
+ALLOCATION_ITERATIONS = 100
+COLOR_SENSOR_PORT = port.D
+
+# END CONSTANTS
+#----------------------------------------
+
+
+# BENCHMARK FUNCTIONS
+#----------------------------------------
+
+def nothing():
+    pass
+
+
+# Single hub calls only. The control ticks they add up to are timed on the
+# real primitives by princess.py (SLOT 7, benchmark_ticks()).
+BENCHMARKS = [
+    ("ticks_us", time.ticks_us),
+    ("tilt_angles", motion_sensor.tilt_angles),
+    ("relative_position A", lambda: motor.relative_position(port.A)),
+    ("velocity A", lambda: motor.velocity(port.A)),
+    ("reflection", lambda: color_sensor.reflection(COLOR_SENSOR_PORT)),
+    ("motor_pair.move", lambda: motor_pair.move(motor_pair.PAIR_1, 0, velocity=0)),
+    ("motor_pair.move_tank", lambda: motor_pair.move_tank(motor_pair.PAIR_1, 0, 0)),
+    ("gc.mem_free", gc.mem_free),
+]
+
+
+# Average microseconds per call, None if the device is not connected
+def measure(function, iterations):
+    try:
+        start_us = time.ticks_us()
+        for _ in range(iterations):
+            function()
+        return time.ticks_diff(time.ticks_us(), start_us) / iterations
+    except OSError:
+        return None
+
+
+# Average bytes allocated per call
+def measure_allocation(function, iterations):
+    try:
+        gc.collect()
+        gc.disable()
+        start_bytes = gc.mem_alloc()
+        for _ in range(iterations):
+            function()
+        return (gc.mem_alloc() - start_bytes) / iterations
+    except OSError:
+        return None
+    finally:
+        gc.enable()
+
+
+def measure_gc_collect(iterations):
+    start_us = time.ticks_us()
+    for _ in range(iterations):
+        gc.collect()
+    return time.ticks_diff(time.ticks_us(), start_us) / iterations
+
+# END BENCHMARK FUNCTIONS
+#----------------------------------------
+
+
+async def benchmark():
+    motor_pair.pair(motor_pair.PAIR_1, port.A, port.E)
+    light_matrix.write("B")
+    gc.collect()
+
+    # cost of the loop and of calling a Python function, taken off every row
+    overhead_us = measure(nothing, BENCHMARK_ITERATIONS)
+    overhead_bytes = measure_allocation(nothing, ALLOCATION_ITERATIONS)
+
+    print("---------------------------------------------------------------------------")
+    print("BENCHMARK: " + str(BENCHMARK_ITERATIONS) + " calls each, loop overhead " + "{:.1f}".format(overhead_us) + " us")
+    print("{:<22} {:>10} {:>12} {:>12}".format("call", "us/call", "loops/s", "bytes/call"))
+    for name, function in BENCHMARKS:
+        gc.collect()
+        per_call_us = measure(function, BENCHMARK_ITERATIONS)
+        if per_call_us is None:
+            print("{:<22} {:>10}".format(name, "n/a"))
+            continue
+        per_call_us = max(0, per_call_us - overhead_us)
+        rate = "-" if per_call_us == 0 else str(int(1000000 / per_call_us))
+        per_call_bytes = max(0, measure_allocation(function, ALLOCATION_ITERATIONS) - overhead_bytes)
+        print("{:<22} {:>10.1f} {:>12} {:>12.0f}".format(name, per_call_us, rate, per_call_bytes))
+    print("{:<22} {:>10.1f}".format("gc.collect", measure_gc_collect(20)))
+    print("---------------------------------------------------------------------------")
+
+    motor_pair.stop(motor_pair.PAIR_1, stop=motor.BRAKE)
+
+
+runloop.run(benchmark())
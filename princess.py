@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
+import gc
 import hub
 import sys
 import time
 
-import color, motor, motor_pair, runloop
+import color, color_sensor, motor, motor_pair, runloop
 from hub import light_matrix, button, motion_sensor, light, port, sound
 
 
@@ -12,6 +13,256 @@ from hub import light_matrix, button, motion_sensor, light, port, sound
 #----------------------------------------
 
 WHEEL_CIRCUMFERENCE = 19.6
+MAX_MOTOR_SPEED = 1110
+
+# HEADING FUSION
+# With HEADING_FUSION on, gyro drives steer from a heading that follows the
+# wheel encoders (A/E) tick to tick and is pulled towards the gyro with a
+# FUSION_TIME_CONSTANT_MS time constant. Vibration noise on the gyro is
+# filtered out without the encoder heading drifting away when wheels slip.
+# TRACK_WIDTH is the distance between the drive wheels (cm).
+HEADING_FUSION = False
+TRACK_WIDTH = 11.2
+FUSION_TIME_CONSTANT_MS = 500
+# robot heading change (degrees) per degree of difference between the wheels
+ODOMETRY_DEGREES_PER_WHEEL_DEGREE = WHEEL_CIRCUMFERENCE / (2 * 3.14159 * TRACK_WIDTH)
+
+# BATTERY COMPENSATION
+# Speeds in the runs were tuned on a battery at BATTERY_REFERENCE_MV. The
+# battery is read at the start of every run. The motors hold any velocity up
+# to BATTERY_HEADROOM_SPEED on every usable battery, so only the part of a
+# command above it (where the motors run out of power) is scaled by
+# reference / actual (kept within BATTERY_SCALE_MIN..MAX).
+# BRAKE_LEAD_DEG makes follow_for_distance stop that many degrees early per
+# 1000 deg/s of speed to cancel the braking slide (0 = off, not measured yet).
+BATTERY_COMPENSATION = True
+BATTERY_REFERENCE_MV = 8000
+BATTERY_SCALE_MIN = 0.9
+BATTERY_SCALE_MAX = 1.15
+BATTERY_HEADROOM_SPEED = 800
+BRAKE_LEAD_DEG = 0
+
+# TRACTION CONTROL
+# Every TRACTION_WINDOW_MS of a gyro / line drive the turn the wheel encoders
+# (A/E) say the robot made is compared with the turn the gyro measured. When
+# they differ by more than TRACTION_SLIP_DEG a wheel has broken loose: the
+# commanded speed drops to TRACTION_BACKOFF of the wheel speed and ramps back
+# up at no more than TRACTION_ACCELERATION deg/s^2 (lowered again by
+# TRACTION_BACKOFF on every further slip in the same drive). Slips are printed
+# after the drive. Both wheels spinning equally does not show on the gyro.
+TRACTION_CONTROL = True
+TRACTION_WINDOW_MS = 40
+TRACTION_SLIP_DEG = 1.5
+TRACTION_ACCELERATION = 2000
+TRACTION_MIN_ACCELERATION = 500
+TRACTION_BACKOFF = 0.7
+
+# SPEED GOVERNOR
+# follow_gyro_angle(..., min_speed=...) treats speed as the top speed and slows
+# down towards min_speed while the heading is off: nothing below
+# GOVERNOR_ERROR_DEG, min_speed from GOVERNOR_FULL_ERROR_DEG, and the same for
+# how fast the heading error is changing (deg/s, measured over
+# GOVERNOR_RATE_WINDOW_MS). Back at top speed as soon as the heading recovers.
+GOVERNOR_ERROR_DEG = 2
+GOVERNOR_FULL_ERROR_DEG = 10
+GOVERNOR_RATE_DPS = 20
+GOVERNOR_FULL_RATE_DPS = 120
+GOVERNOR_RATE_WINDOW_MS = 20
+
+# Set to True to time every drive / turn / arm step and print a ranked
+# breakdown after each run. When False the steps only pay one ticks_ms() call.
+# Background arm moves (start_arm) are left out: they overlap the steps that are.
+PROFILE_STEPS = False
+PROFILE_MAX_STEPS = 64
+
+# MATCH PLANNER
+# A match is 150 s. Points / success chance per run are estimates from the
+# score sheet and practice; run and transition times come from the SUMMARY
+# block printed by execute (they are updated live while execute runs).
+MATCH_TIME_MS = 150000
+RUN_POINTS = {1: 50, 2: 40, 3: 30, 4: 75, 5: 60, 6: 55}
+RUN_SUCCESS = {1: 0.9, 2: 0.9, 3: 0.95, 4: 0.8, 5: 0.85, 6: 0.8}
+RUN_TIME_MS = {1: 16500, 2: 15800, 3: 7700, 4: 22300, 5: 15800, 6: 21400}
+DEFAULT_TRANSITION_MS = 8000
+TRANSITION_MS = {}      # (previous run, next run) -> measured transition time
+# run 2 drops the topsoil collected in run 1, run 6 drops the scale pan (run 4) and heavy lifting (run 5).
+# Requirements that are not among the runs given to execute count as done.
+RUN_REQUIRES = {2: (1,), 6: (4, 5)}
+
+# MATCH PACING
+# Time budget per run and per transition (handoff in base). While execute
+# runs, the power light shows the match clock against the budget so far:
+# GREEN more than PACE_MARGIN_MS ahead, YELLOW just ahead, RED behind, and the
+# light matrix shows how many seconds ahead / behind (up to 9). A short beep
+# plays when a transition goes over its budget. Budgets count from the start
+# of the first run, like ACTUAL TOTAL ELAPSED TIME in the summary.
+PACING = True
+RUN_BUDGET_MS = {1: 17000, 2: 16000, 3: 8000, 4: 23000, 5: 16000, 6: 22000}
+TRANSITION_BUDGET_MS = 6000
+PACE_MARGIN_MS = 2000
+PACE_UPDATE_MS = 250
+PACE_BEEP_HZ = 880
+
+# FIXED POINT PID
+# follow_gyro_angle(..., fixed_point=True) runs the heading PID in integer
+# math on the raw yaw (decidegrees) with gains scaled by 2^FIXED_POINT_SHIFT,
+# so a control tick allocates no floats (traction control is integer-only
+# too; the speed governor, min_speed=..., is not). It steers from the plain
+# gyro (HEADING_FUSION and HEADING_REFERENCE only apply to the float PID).
+FIXED_POINT_SHIFT = 16
+FIXED_POINT_DIVISOR = 10 << FIXED_POINT_SHIFT
+
+# TICK BENCHMARK
+# SLOT 7 times the real drive primitives on a stand (speed 0) for
+# TICK_BENCHMARK_TICKS control ticks each and prints us and bytes per tick,
+# with the switches above (snapshot, traction, governor, GC) as they are set.
+# benchmark.py only times the single hub calls a tick is made of.
+TICK_BENCHMARK_TICKS = 500
+
+# HEADING REFERENCE
+# With HEADING_REFERENCE on, yaw is only reset before the first run. Later
+# runs keep the heading the gyro carried over, so the robot does not have to
+# be placed at exactly the right angle. While the robot sits still in base
+# waiting for the LEFT button, the gyro drift is measured over
+# DRIFT_WINDOW_MS windows and subtracted from every yaw reading during runs.
+# Pressing RIGHT in base re-zeroes the heading (robot in the jig).
+HEADING_REFERENCE = False
+DRIFT_WINDOW_MS = 3000
+DRIFT_SMOOTHING = 0.3
+MAX_DRIFT_DPS = 0.5
+
+# TURN OVERSHOOT
+# pivot_gyro_turn_abs only stops once the yaw has crossed the target, and the
+# robot keeps turning while it brakes. With TURN_LEARNING on, the heading the
+# robot settles at after every stop=True turn is compared with where the stop
+# was commanded, and the overshoot is averaged per turn type (spin / pivot),
+# speed and direction. The table is saved to TURN_TABLE_FILE after every run
+# and loaded by execute. With TURN_COMPENSATION on, turns stop early by the
+# learned overshoot so the run targets can be the real angles. Leave it off
+# while the runs still have overshoot worked into their targets.
+# Learning is a practice-only switch: it waits up to TURN_SETTLE_MAX_MS for the
+# robot to settle before the next primitive and writes the table after every
+# run, so keep it off in a match.
+TURN_LEARNING = False
+TURN_COMPENSATION = False
+TURN_TABLE_FILE = "turn_overshoot.txt"
+TURN_LEARN_RATE = 0.3
+TURN_MAX_OVERSHOOT = 15
+# the robot counts as settled below this wheel speed (deg/s); a turn that has
+# not settled TURN_SETTLE_MAX_MS after the stop is not learned from
+TURN_SETTLED_SPEED = 20
+TURN_SETTLE_MAX_MS = 60
+
+# DRIVE TRIGGERS
+# follow_gyro_angle / follow_gyro_angle_stall / follow_line take triggers=[...]
+# built with at_distance / at_heading / after_ms. Each trigger fires once,
+# checked every control tick, and either starts an action (a function that
+# must not wait, e.g. lambda: start_arm_to("flag down", 500)) or changes the
+# speed, without ending the drive. Distance and time count from the start of
+# the drive. A trigger speed is a size only: it keeps the drive's direction
+# (speed=500 on a speed=-1000 drive slows it to -500), like min_speed does.
+#
+# at_line is a landmark: a line the color sensor crosses distance_cm into the
+# drive. When the sensor sees it within LANDMARK_WINDOW_CM of where it is
+# expected, the distance covered so far is snapped to distance_cm, so
+# follow_for_distance ends the drive at the right place on the mat even if the
+# wheels slipped. Every correction (or missed line) is printed after the drive.
+TRIGGER_DISTANCE = 0
+TRIGGER_HEADING = 1
+TRIGGER_TIME = 2
+TRIGGER_LINE = 3
+LANDMARK_WINDOW_CM = 3
+# landmark results kept per drive (the log is allocated once)
+LANDMARK_MAX = 8
+
+# LINE FOLLOWING
+# follow_line steers along one edge of a black line from the reflection of
+# LINE_SENSOR_PORT. The edge target is halfway between the black and white
+# readings (calibrate on the mat with calibrate_line_sensor). Gains come from
+# LINE_GAINS by speed (deg/s), interpolated in between, unless given.
+LINE_SENSOR_PORT = port.D
+LINE_BLACK_REFLECTION = 18
+LINE_WHITE_REFLECTION = 97
+# (speed, kp, ki, kd): faster needs less proportional and more damping
+LINE_GAINS = (
+    (150, 0.8, 0.0, 2.0),
+    (400, 0.5, 0.0, 3.0),
+    (800, 0.3, 0.0, 4.0),
+)
+
+# MEMORY
+# Automatic garbage collection is turned off inside drive / turn primitives so
+# a collection can never pause a control loop. The heap is collected at every
+# run boundary instead (report_heap), and before a primitive that would start
+# with less than GC_RESERVE_BYTES free. If free heap still drops below
+# GC_RESERVE_BYTES inside a primitive (checked every GC_CHECK_TICKS control
+# ticks or turn polls) it is collected between two ticks.
+GC_CONTROL = True
+GC_ALLOC_BUDGET_BYTES = 4096
+GC_RESERVE_BYTES = 8192
+GC_CHECK_TICKS = 32
+
+# ATTACHMENT POSES
+# Arm positions (degrees) on ports B and C are set once before the first run
+# (home_arms()) and never reset after. A pose is (port, offset): the offset is
+# measured from where the arm was when the current run started
+# (capture_arm_starts()), so the numbers stay the ones tuned run by run and
+# hold whatever order the runs go in (plan=True may skip or reorder them).
+# ARM_RUN_START is only used before the first run: it is where each run starts
+# ports (B, C) with the arms set the way the runs before leave them when runs
+# go 1..6 (run 1 starts at 0), in the frame of the ARM_HOME hard stops.
+# ARM_HOME lists the arms that are homed against their hard stop before the
+# first run: {port: (velocity, position of the hard stop)}. Arms not listed
+# are set by hand in base.
+ARM_POSE_TOLERANCE = 5
+ARM_RUN_START = {
+    1: (0, 0),
+    2: (-260, -130),
+    3: (-410, -95),
+    4: (-410, -95),
+    5: (-360, -595),
+    6: (-360, -595),
+}
+ARM_HOME = {}
+ARM_POSES = {
+    # run 1 - map reveal / surface brushing
+    "explorer arm down": (port.C, 375),
+    "explorer lift": (port.C, 15),
+    "artifact lift": (port.B, 195),
+    "artifact slide": (port.B, 340),
+    "artifact drop": (port.B, -260),
+    "topsoil scoop": (port.C, -345),
+    "topsoil lift": (port.C, -255),
+    "topsoil carry": (port.C, -130),
+    # run 2 - topsoil / brush
+    "topsoil drop": (port.C, 260),
+    "topsoil arm up": (port.C, 0),
+    "topsoil push": (port.C, 385),
+    "topsoil arm clear": (port.C, 35),
+    "brush up": (port.B, -1000),
+    "brush ready": (port.B, -800),
+    "brush drop": (port.B, -150),
+    # run 3 - salvage operation flag
+    "flag up": (port.C, 0),
+    "flag down": (port.C, 300),
+    # run 4 - statue rebuild
+    "statue ready": (port.B, -2300),
+    "statue lever": (port.B, -2850),
+    "lift statue": (port.B, -1650),
+    "statue up": (port.B, 50),
+    "angler lift": (port.C, -500),
+    # run 5 - silo hammer / heavy lifting
+    "hammer up": (port.C, 0),
+    "hammer down": (port.C, 230),
+    "heavy lifting lower": (port.B, -1650),
+    "heavy lifting down": (port.B, -2200),
+    "heavy lifting hook": (port.B, -1300),
+    "heavy lifting up": (port.B, 0),
+    # run 6 - mineshaft / heavy lifting drop
+    "mineshaft lift": (port.C, 1000),
+    "mineshaft drop": (port.C, -400),
+    "scale pan drop": (port.B, -1300),
+}
 
 # END CONSTANTS
 #----------------------------------------
@@ -20,11 +271,52 @@ WHEEL_CIRCUMFERENCE = 19.6
 # UTILITY FUNCTIONS
 #----------------------------------------
 
+battery_scale = 1.0
+brake_lead_deg = 0
+
+
+# Read the battery once per run and work out how much to scale velocities by
+def update_battery_scale():
+    global battery_scale
+    voltage_mv = battery_voltage_mv()
+    battery_scale = 1.0
+    if BATTERY_COMPENSATION and voltage_mv > 0:
+        battery_scale = min(BATTERY_SCALE_MAX, max(BATTERY_SCALE_MIN, BATTERY_REFERENCE_MV / voltage_mv))
+    return voltage_mv
+
+
+def battery_voltage_mv():
+    try:
+        return hub.battery_voltage()
+    except AttributeError:
+        return 0
+
+
+# Velocity corrected for the battery above the headroom speed, clipped to what the motors can do
+def scaled_speed(speed):
+    if -BATTERY_HEADROOM_SPEED <= speed <= BATTERY_HEADROOM_SPEED:
+        return int(speed)
+    headroom = BATTERY_HEADROOM_SPEED if speed > 0 else -BATTERY_HEADROOM_SPEED
+    speed = headroom + (speed - headroom) * battery_scale
+    if speed > MAX_MOTOR_SPEED:
+        return MAX_MOTOR_SPEED
+    if speed < -MAX_MOTOR_SPEED:
+        return -MAX_MOTOR_SPEED
+    return int(speed)
+
+
+def set_brake_lead(speed):
+    global brake_lead_deg
+    brake_lead_deg = BRAKE_LEAD_DEG * abs(speed) / 1000
+
+
 # initialize motor and reset yaw
-def do_init():
+def do_init(reset_yaw=True):
     # reset yaw to 0
     motion_sensor.set_yaw_face(motion_sensor.TOP)
-    motion_sensor.reset_yaw(0)
+    if reset_yaw:
+        motion_sensor.reset_yaw(0)
+        reset_yaw_correction()
     i = 0
     while (hub.motion_sensor.stable() == False):
         i = i + 1
@@ -46,19 +338,302 @@ def is_right_button_pressed():
     return button.pressed(button.RIGHT) > 0
 
 
+# SENSOR SNAPSHOT
+# Inside a control loop every sensor is read at most once per tick: the first
+# read of a tick goes to the hub and is kept, later reads in the same tick
+# (PID, stop condition, stall check, triggers) get the kept value. The loop
+# calls next_sensor_tick() after the motor command. Outside control loops the
+# read functions always go to the hub.
+sensor_sampling = False
+sensor_tick = 0
+snap_yaw = 0
+snap_yaw_tick = -1
+snap_positions = [0, 0, 0, 0, 0, 0]          # by port
+snap_position_ticks = [-1, -1, -1, -1, -1, -1]
+snap_reflections = [0, 0, 0, 0, 0, 0]
+snap_reflection_ticks = [-1, -1, -1, -1, -1, -1]
+
+
+def sensor_ticks_begin():
+    global sensor_sampling
+    sensor_sampling = True
+    next_sensor_tick()
+
+
+def next_sensor_tick():
+    global sensor_tick
+    sensor_tick += 1
+
+
+def sensor_ticks_end():
+    global sensor_sampling
+    sensor_sampling = False
+
+
+# Raw yaw in decidegrees (counter-clockwise positive)
+def read_tilt_yaw():
+    global snap_yaw, snap_yaw_tick
+    if sensor_sampling and snap_yaw_tick == sensor_tick:
+        return snap_yaw
+    snap_yaw = motion_sensor.tilt_angles()[0]
+    snap_yaw_tick = sensor_tick
+    return snap_yaw
+
+
+def read_position(port_id):
+    if sensor_sampling and snap_position_ticks[port_id] == sensor_tick:
+        return snap_positions[port_id]
+    position = motor.relative_position(port_id)
+    snap_positions[port_id] = position
+    snap_position_ticks[port_id] = sensor_tick
+    return position
+
+
+def read_reflection(port_id):
+    if sensor_sampling and snap_reflection_ticks[port_id] == sensor_tick:
+        return snap_reflections[port_id]
+    reflection = color_sensor.reflection(port_id)
+    snap_reflections[port_id] = reflection
+    snap_reflection_ticks[port_id] = sensor_tick
+    return reflection
+
+
 def follow_for_distance(initial_position=0,
                         distance_to_cover=0):
-    current_position = abs(motor.relative_position(port.A))
+    current_position = abs(read_position(port.A))
     distance_covered = current_position - initial_position
     if distance_covered < 0 : distance_covered = distance_covered * -1
-    if (distance_covered >= abs(distance_to_cover)):
+    if (distance_covered + distance_correction_deg + brake_lead_deg >= abs(distance_to_cover)):
         return False
     else:
         return True
 
 
+yaw_drift_dps = 0.0
+yaw_correction = 0.0
+yaw_correction_ms = 0
+
+
+def get_raw_yaw_value():
+    return read_tilt_yaw() * -0.1
+
+
 def get_yaw_value():
-    return motion_sensor.tilt_angles()[0] * -0.1
+    yaw = read_tilt_yaw() * -0.1
+    if HEADING_REFERENCE:
+        yaw -= yaw_correction + yaw_drift_dps * time.ticks_diff(time.ticks_ms(), yaw_correction_ms) / 1000
+        if yaw >= 180:
+            yaw -= 360
+        elif yaw < -180:
+            yaw += 360
+    return yaw
+
+
+def reset_yaw_correction():
+    global yaw_correction, yaw_correction_ms
+    yaw_correction = 0.0
+    yaw_correction_ms = time.ticks_ms()
+
+
+# Fold the drift so far into yaw_correction and continue with a new drift rate
+def set_yaw_drift(drift_dps):
+    global yaw_drift_dps, yaw_correction, yaw_correction_ms
+    now = time.ticks_ms()
+    yaw_correction += yaw_drift_dps * time.ticks_diff(now, yaw_correction_ms) / 1000
+    yaw_correction_ms = now
+    yaw_drift_dps = max(-MAX_DRIFT_DPS, min(MAX_DRIFT_DPS, drift_dps))
+
+
+# Re-zero the heading, e.g. with the robot squared up in the jig
+def rezero_heading():
+    motion_sensor.reset_yaw(0)
+    reset_yaw_correction()
+
+
+# Wait for the LEFT button in base. While the robot stands still the gyro
+# drift is measured, RIGHT re-zeroes the heading.
+async def wait_in_base():
+    window_start_ms = None
+    window_start_yaw = 0.0
+    while not is_left_button_pressed():
+        if is_right_button_pressed():
+            rezero_heading()
+            window_start_ms = None
+        elif HEADING_REFERENCE and motion_sensor.stable():
+            now = time.ticks_ms()
+            yaw = get_raw_yaw_value()
+            if window_start_ms is None:
+                window_start_ms = now
+                window_start_yaw = yaw
+            elif time.ticks_diff(now, window_start_ms) >= DRIFT_WINDOW_MS:
+                change = yaw - window_start_yaw
+                if change > 180:
+                    change -= 360
+                elif change < -180:
+                    change += 360
+                measured_dps = change * 1000 / time.ticks_diff(now, window_start_ms)
+                set_yaw_drift(yaw_drift_dps + DRIFT_SMOOTHING * (measured_dps - yaw_drift_dps))
+                window_start_ms = now
+                window_start_yaw = yaw
+        else:
+            window_start_ms = None
+        if PACING: pace_update()
+        await runloop.sleep_ms(50)
+
+
+fused_heading = 0.0
+fusion_last_left = 0
+fusion_last_right = 0
+fusion_last_ms = 0
+
+
+# Start the fused heading from the gyro (call at the start of a drive)
+def heading_reset():
+    global fused_heading, fusion_last_left, fusion_last_right, fusion_last_ms
+    fused_heading = get_yaw_value()
+    fusion_last_left = read_position(port.A)
+    fusion_last_right = read_position(port.E)
+    fusion_last_ms = time.ticks_ms()
+
+
+# Complementary filter: encoder heading change every tick, corrected towards the gyro
+def get_fused_heading():
+    global fused_heading, fusion_last_left, fusion_last_right, fusion_last_ms
+    left = read_position(port.A)
+    right = read_position(port.E)
+    now = time.ticks_ms()
+    # the left motor is mirrored, it turns backwards when the robot drives forward
+    wheel_difference = (fusion_last_left - left) - (right - fusion_last_right)
+    fused_heading += wheel_difference * ODOMETRY_DEGREES_PER_WHEEL_DEGREE
+    gyro_error = get_yaw_value() - fused_heading
+    if gyro_error > 180:
+        gyro_error -= 360
+    elif gyro_error < -180:
+        gyro_error += 360
+    elapsed_ms = time.ticks_diff(now, fusion_last_ms)
+    fused_heading += gyro_error * elapsed_ms / (FUSION_TIME_CONSTANT_MS + elapsed_ms)
+    fusion_last_left = left
+    fusion_last_right = right
+    fusion_last_ms = now
+    return fused_heading
+
+
+# Heading used by the gyro drives
+def get_drive_heading():
+    if HEADING_FUSION:
+        return get_fused_heading()
+    return get_yaw_value()
+
+
+traction_last_ms = 0
+traction_last_left = 0
+traction_last_right = 0
+traction_last_yaw = 0
+traction_limit = None       # speed cap (deg/s) while ramping back up after a slip
+traction_ramp_from = 0      # speed cap right after the slip
+traction_ramp_ms = 0
+traction_acceleration = TRACTION_ACCELERATION
+traction_slips = 0
+# integer forms of the constants: a traction tick does no float math
+traction_turn_fixed = int(ODOMETRY_DEGREES_PER_WHEEL_DEGREE * 10 * (1 << FIXED_POINT_SHIFT))    # decidegrees << shift per wheel degree
+traction_slip_decidegrees = int(TRACTION_SLIP_DEG * 10)
+traction_backoff_percent = int(TRACTION_BACKOFF * 100)
+
+
+# Start watching for wheel slip (call at the start of a drive)
+def traction_begin():
+    global traction_last_ms, traction_last_left, traction_last_right, traction_last_yaw
+    global traction_limit, traction_acceleration, traction_slips
+    traction_last_ms = time.ticks_ms()
+    traction_last_left = read_position(port.A)
+    traction_last_right = read_position(port.E)
+    traction_last_yaw = read_tilt_yaw()
+    traction_limit = None
+    traction_acceleration = TRACTION_ACCELERATION
+    traction_slips = 0
+
+
+# Speed to command this tick: `speed`, or less while recovering from a slip
+def traction_speed(speed):
+    global traction_last_ms, traction_last_left, traction_last_right, traction_last_yaw
+    global traction_limit, traction_ramp_from, traction_ramp_ms, traction_acceleration, traction_slips
+    now = time.ticks_ms()
+    if traction_limit is not None:
+        traction_limit = traction_ramp_from + traction_acceleration * time.ticks_diff(now, traction_ramp_ms) // 1000
+        if traction_limit >= abs(speed):
+            traction_limit = None
+    elapsed_ms = time.ticks_diff(now, traction_last_ms)
+    if elapsed_ms >= TRACTION_WINDOW_MS:
+        left = read_position(port.A)
+        right = read_position(port.E)
+        yaw = read_tilt_yaw()
+        # the left motor is mirrored, it turns backwards when the robot drives forward
+        encoder_turn = (((traction_last_left - left) - (right - traction_last_right)) * traction_turn_fixed) >> FIXED_POINT_SHIFT
+        gyro_change = traction_last_yaw - yaw
+        if gyro_change > 1800:
+            gyro_change -= 3600
+        elif gyro_change < -1800:
+            gyro_change += 3600
+        if abs(encoder_turn - gyro_change) > traction_slip_decidegrees:
+            if traction_slips:
+                traction_acceleration = max(TRACTION_MIN_ACCELERATION, traction_acceleration * traction_backoff_percent // 100)
+            traction_slips += 1
+            wheel_speed = (abs(traction_last_left - left) + abs(right - traction_last_right)) * 500 // elapsed_ms
+            traction_limit = wheel_speed * traction_backoff_percent // 100
+            traction_ramp_from = traction_limit
+            traction_ramp_ms = now
+        traction_last_ms = now
+        traction_last_left = left
+        traction_last_right = right
+        traction_last_yaw = yaw
+    if traction_limit is None:
+        return speed
+    return traction_limit if speed > 0 else -traction_limit
+
+
+def traction_end(label):
+    if traction_slips:
+        print(label + ": wheel slip " + str(traction_slips) + " times, ramped at " + str(traction_acceleration) + " deg/s^2")
+
+
+governor_last_error = 0.0
+governor_last_ms = None
+governor_rate = 0.0
+
+
+def governor_begin():
+    global governor_last_ms, governor_rate
+    governor_last_ms = None
+    governor_rate = 0.0
+
+
+# share (0..1) of the way from low to high
+def governor_share(value, low, high):
+    if value <= low:
+        return 0.0
+    if value >= high:
+        return 1.0
+    return (value - low) / (high - low)
+
+
+# Speed for this tick between max_speed and min_speed from the heading error (degrees)
+def governor_speed(max_speed, min_speed, error_deg):
+    global governor_last_error, governor_last_ms, governor_rate
+    # a trigger may have lowered max_speed below min_speed: never speed up
+    if abs(min_speed) > abs(max_speed):
+        min_speed = max_speed
+    now = time.ticks_ms()
+    if governor_last_ms is None:
+        governor_last_error = error_deg
+        governor_last_ms = now
+    elapsed_ms = time.ticks_diff(now, governor_last_ms)
+    if elapsed_ms >= GOVERNOR_RATE_WINDOW_MS:
+        governor_rate = (error_deg - governor_last_error) * 1000 / elapsed_ms
+        governor_last_error = error_deg
+        governor_last_ms = now
+    slow_down = max(governor_share(abs(error_deg), GOVERNOR_ERROR_DEG, GOVERNOR_FULL_ERROR_DEG),
+                    governor_share(abs(governor_rate), GOVERNOR_RATE_DPS, GOVERNOR_FULL_RATE_DPS))
+    return int(max_speed - (max_speed - min_speed) * slow_down)
 
 
 def degrees_for_distance(distance_cm):
@@ -66,18 +641,185 @@ def degrees_for_distance(distance_cm):
     return int((distance_cm/WHEEL_CIRCUMFERENCE) * 360)
 
 
+# Same turn as motor_pair.move(steering, velocity=speed), but computed per wheel:
+# when the outer wheel would pass MAX_MOTOR_SPEED both wheels slow down by the
+# excess, so the full steering correction survives at top speed.
+def move_steering_tank(steering, speed):
+    steering = int(steering)
+    if steering > 100:
+        steering = 100
+    elif steering < -100:
+        steering = -100
+    # truncate towards zero so the same steering turns as hard both ways
+    half_correction = abs(speed * steering) // 100
+    if (speed < 0) != (steering < 0):
+        half_correction = -half_correction
+    left_speed = speed + half_correction
+    right_speed = speed - half_correction
+    excess = max(abs(left_speed), abs(right_speed)) - MAX_MOTOR_SPEED
+    if excess > 0:
+        if speed < 0:
+            excess = -excess
+        left_speed -= excess
+        right_speed -= excess
+    motor_pair.move_tank(motor_pair.PAIR_1, int(left_speed), int(right_speed))
+
+
+# PID gains scaled for the fixed point PID
+def fixed_gains(kp, ki, kd):
+    scale = 1 << FIXED_POINT_SHIFT
+    return int(round(kp * scale)), int(round(ki * scale)), int(round(kd * scale))
+
+
+# Fixed point PID output to steering, truncated towards 0 like int() does
+def fixed_steering(scaled_output):
+    if scaled_output < 0:
+        return -(-scaled_output // FIXED_POINT_DIVISOR)
+    return scaled_output // FIXED_POINT_DIVISOR
+
+
+# One 10 ms poll of wait_for_yaw_abs; GC is off during a turn, so watch the heap
+def yaw_poll_wait():
+    time.sleep_ms(10)
+    gc_tick()
+
+
 def wait_for_yaw_abs(angle=0):
     abs_angle = abs(angle)
-    abs_current_yaw = abs(get_yaw_value())
+    current_yaw = get_yaw_value()
+    abs_current_yaw = abs(current_yaw)
     if angle == 0:
-        if get_yaw_value() > 0:
-            while get_yaw_value() >= angle: time.sleep_ms(10)
-        elif get_yaw_value() < 0:
-            while get_yaw_value() <= angle: time.sleep_ms(10)
+        if current_yaw > 0:
+            while get_yaw_value() >= angle: yaw_poll_wait()
+        elif current_yaw < 0:
+            while get_yaw_value() <= angle: yaw_poll_wait()
     elif abs_current_yaw > abs_angle:
-        while abs(get_yaw_value()) >= abs_angle: time.sleep_ms(10)
+        while abs(get_yaw_value()) >= abs_angle: yaw_poll_wait()
     elif abs_current_yaw < abs_angle:
-        while abs(get_yaw_value()) <= abs_angle: time.sleep_ms(10)
+        while abs(get_yaw_value()) <= abs_angle: yaw_poll_wait()
+
+
+trigger_start_position = 0
+trigger_start_ms = 0
+# landmark correction added to the distance covered in the current drive
+distance_correction_deg = 0
+# what the landmarks of the current drive did: expected distance and the
+# correction (None if the line was not seen)
+landmark_expected = [0] * LANDMARK_MAX
+landmark_corrections = [None] * LANDMARK_MAX
+landmark_count = 0
+
+
+# Fire `action` and / or change to `speed` once the drive has covered distance_cm
+def at_distance(distance_cm, action=None, speed=None):
+    return (TRIGGER_DISTANCE, degrees_for_distance(distance_cm), action, speed)
+
+
+# ... once the heading has reached `angle` (crossed it from the side it started on)
+def at_heading(angle, action=None, speed=None):
+    return (TRIGGER_HEADING, angle, action, speed)
+
+
+# ... once the drive has been going for `ms` milliseconds
+def after_ms(ms, action=None, speed=None):
+    return (TRIGGER_TIME, ms, action, speed)
+
+
+# Landmark: the sensor on sensor_port crosses a line distance_cm into the drive
+def at_line(distance_cm, window_cm=LANDMARK_WINDOW_CM, sensor_port=LINE_SENSOR_PORT, action=None, speed=None):
+    return (TRIGGER_LINE, (degrees_for_distance(distance_cm), degrees_for_distance(window_cm), sensor_port), action, speed)
+
+
+# Speed a trigger changes the drive to: the trigger's size, in the drive's direction
+def trigger_speed(new_speed, speed):
+    new_speed = abs(scaled_speed(new_speed))
+    return -new_speed if speed < 0 else new_speed
+
+
+def drive_distance_covered():
+    return abs(read_position(port.A) - trigger_start_position) + distance_correction_deg
+
+
+# Snap the distance covered to the landmark if its line is under the sensor.
+# Returns True once the landmark is done with (seen, or passed without seeing it).
+def check_landmark(landmark):
+    global distance_correction_deg
+    expected, window, sensor_port = landmark
+    covered = drive_distance_covered()
+    if covered > expected + window:
+        log_landmark(expected, None)
+        return True
+    if covered < expected - window or read_reflection(sensor_port) >= line_edge_target:
+        return False
+    distance_correction_deg += expected - covered
+    log_landmark(expected, expected - covered)
+    return True
+
+
+def log_landmark(expected, correction):
+    global landmark_count
+    i = landmark_count
+    if i >= LANDMARK_MAX:
+        return
+    landmark_expected[i] = expected
+    landmark_corrections[i] = correction
+    landmark_count = i + 1
+
+
+# Pending copy of the triggers for one drive: [kind, value, action, speed, side]
+def triggers_begin(triggers):
+    global trigger_start_position, trigger_start_ms, distance_correction_deg
+    distance_correction_deg = 0
+    pending = []
+    if not triggers:
+        return pending
+    trigger_start_position = read_position(port.A)
+    trigger_start_ms = time.ticks_ms()
+    for kind, value, action, speed in triggers:
+        side = 0
+        if kind == TRIGGER_HEADING:
+            side = 1 if value >= get_yaw_value() else -1
+        pending.append([kind, value, action, speed, side])
+    return pending
+
+
+# Fire every pending trigger that has been reached, return the new speed or None
+def run_triggers(pending):
+    new_speed = None
+    i = 0
+    while i < len(pending):
+        kind, value, action, speed, side = pending[i]
+        if kind == TRIGGER_DISTANCE:
+            reached = drive_distance_covered() >= value
+        elif kind == TRIGGER_HEADING:
+            reached = (value - get_yaw_value()) * side <= 0
+        elif kind == TRIGGER_LINE:
+            reached = check_landmark(value)
+        else:
+            reached = time.ticks_diff(time.ticks_ms(), trigger_start_ms) >= value
+        if not reached:
+            i += 1
+            continue
+        pending.pop(i)
+        if action is not None:
+            action()
+        if speed is not None:
+            new_speed = speed
+    return new_speed
+
+
+# Drop the landmark correction and print what the landmarks of the drive did
+def triggers_end(label):
+    global distance_correction_deg, landmark_count
+    distance_correction_deg = 0
+    for i in range(landmark_count):
+        expected, correction = landmark_expected[i], landmark_corrections[i]
+        where = "{:.1f}".format(expected * WHEEL_CIRCUMFERENCE / 360)
+        if correction is None:
+            print(label + ": line at " + where + " cm not seen")
+        else:
+            print(label + ": line at " + where + " cm, corrected by " + "{:.1f}".format(correction * WHEEL_CIRCUMFERENCE / 360) + " cm")
+    landmark_count = 0
 
 
 async def follow_gyro_angle(kp,
@@ -87,27 +829,76 @@ async def follow_gyro_angle(kp,
                             target_angle,
                             sleep_time,
                             brake_action,
-                            follow_for, **kwargs):
+                            follow_for,
+                            fixed_point=False,
+                            triggers=None,
+                            min_speed=None,
+                            label="follow_gyro_angle",
+                            **kwargs):
+    start_ms = time.ticks_ms()
+    speed = scaled_speed(speed)
+    set_brake_lead(speed)
+    if min_speed is not None:
+        # same direction as speed (governor_speed keeps it below the current speed)
+        min_speed = abs(scaled_speed(min_speed))
+        if speed < 0:
+            min_speed = -min_speed
+        governor_begin()
+    if TURN_LEARNING: turn_learn_settled()
+    if PACING: pace_update()
+    gc_begin_primitive()
+    sensor_ticks_begin()
+    if HEADING_FUSION: heading_reset()
+    if TRACTION_CONTROL: traction_begin()
+    pending_triggers = triggers_begin(triggers)
     # get initial reading from left motor
     integral = 0.0
     last_error = 0.0
     derivative = 0.0
+    if fixed_point:
+        kp_fixed, ki_fixed, kd_fixed = fixed_gains(kp, ki, kd)
+        target_decidegrees = int(round(target_angle * 10))
+        integral = 0
+        last_error = 0
     while (follow_for(**kwargs)):
-        current_angle = get_yaw_value()
-        error = current_angle - target_angle
-        integral = integral + error
-        derivative = error - last_error
-        last_error = error
-        # compute steering correction
-        steering_value = (error * kp) + (integral * ki) + (derivative * kd)
+        if fixed_point:
+            # raw yaw in decidegrees (clockwise positive), integer math only
+            error = -read_tilt_yaw() - target_decidegrees
+            integral += error
+            steering_value = fixed_steering((error * kp_fixed) + (integral * ki_fixed) + ((error - last_error) * kd_fixed))
+            last_error = error
+        else:
+            current_angle = get_drive_heading()
+            error = current_angle - target_angle
+            integral = integral + error
+            derivative = error - last_error
+            last_error = error
+            # compute steering correction
+            steering_value = (error * kp) + (integral * ki) + (derivative * kd)
 
         if sleep_time:
             time.sleep_ms(sleep_time)
         # kp value should be +ve for forward movement (positive speed value), and -ve for backward movement (negative speed value)
-        motor_pair.move(motor_pair.PAIR_1, int(steering_value), velocity=speed)
+        if pending_triggers:
+            new_speed = run_triggers(pending_triggers)
+            if new_speed is not None:
+                speed = trigger_speed(new_speed, speed)
+                set_brake_lead(speed)
+        drive_speed = speed
+        if min_speed is not None:
+            drive_speed = governor_speed(speed, min_speed, error * 0.1 if fixed_point else error)
+        move_steering_tank(steering_value, traction_speed(drive_speed) if TRACTION_CONTROL else drive_speed)
+        gc_tick()
+        next_sensor_tick()
 
     # stop when follow_for condition is met
+    sensor_ticks_end()
     motor_pair.stop(motor_pair.PAIR_1, stop=brake_action)
+    set_brake_lead(0)
+    gc_end_primitive(label)
+    triggers_end(label)
+    if TRACTION_CONTROL: traction_end(label)
+    if PROFILE_STEPS: profile_step(label, start_ms, "done")
 
 async def follow_gyro_angle_stall(
                                     kp,
@@ -122,40 +913,73 @@ async def follow_gyro_angle_stall(
                                     stall_degrees=3,
                                     check_ms=50,
                                     max_ms=None,
+                                    fixed_point=False,
+                                    triggers=None,
+                                    label="follow_gyro_angle_stall",
                                     **kwargs
                                 ):
     integral = 0.0
     last_error = 0.0
+    speed = scaled_speed(speed)
+    set_brake_lead(speed)
+    if TURN_LEARNING: turn_learn_settled()
+    if PACING: pace_update()
+    gc_begin_primitive()
+    sensor_ticks_begin()
+    if HEADING_FUSION: heading_reset()
+    if TRACTION_CONTROL: traction_begin()
+    pending_triggers = triggers_begin(triggers)
+    if fixed_point:
+        kp_fixed, ki_fixed, kd_fixed = fixed_gains(kp, ki, kd)
+        target_decidegrees = int(round(target_angle * 10))
+        integral = 0
+        last_error = 0
 
     start_ms = time.ticks_ms()
     last_progress_ms = start_ms
 
-    last_left = motor.relative_position(port.A)
-    last_right = motor.relative_position(port.E)
+    last_left = read_position(port.A)
+    last_right = read_position(port.E)
+    reason = "done"
 
     while follow_for(**kwargs):
         now = time.ticks_ms()
 
         # Safety timeout: protects runtime even if wheels slip instead of truly stalling.
         if max_ms is not None and time.ticks_diff(now, start_ms) >= max_ms:
+            reason = "timeout"
             break
 
-        current_angle = get_yaw_value()
-        error = current_angle - target_angle
-
-        integral += error
-        derivative = error - last_error
-        last_error = error
-
-        steering_value = (error * kp) + (integral * ki) + (derivative * kd)
-
-        motor_pair.move(motor_pair.PAIR_1, int(steering_value), velocity=speed)
+        if fixed_point:
+            error = -read_tilt_yaw() - target_decidegrees
+            integral += error
+            steering_value = fixed_steering((error * kp_fixed) + (integral * ki_fixed) + ((error - last_error) * kd_fixed))
+            last_error = error
+        else:
+            current_angle = get_drive_heading()
+            error = current_angle - target_angle
+
+            integral += error
+            derivative = error - last_error
+            last_error = error
+
+            steering_value = (error * kp) + (integral * ki) + (derivative * kd)
+
+        if pending_triggers:
+            new_speed = run_triggers(pending_triggers)
+            if new_speed is not None:
+                speed = trigger_speed(new_speed, speed)
+                set_brake_lead(speed)
+        move_steering_tank(steering_value, traction_speed(speed) if TRACTION_CONTROL else speed)
+        gc_tick()
 
         delay = sleep_time if sleep_time else check_ms
         await runloop.sleep_ms(delay)
 
-        left = motor.relative_position(port.A)
-        right = motor.relative_position(port.E)
+        # the new tick's positions are also used by follow_for and the PID
+        next_sensor_tick()
+        left = read_position(port.A)
+        right = read_position(port.E)
 
         left_delta = abs(left - last_left)
         right_delta = abs(right - last_right)
@@ -168,14 +992,206 @@ async def follow_gyro_angle_stall(
             last_right = right
 
         if time.ticks_diff(time.ticks_ms(), last_progress_ms) >= stall_ms:
+            reason = "stall"
             break
 
+    sensor_ticks_end()
     motor_pair.stop(motor_pair.PAIR_1, stop=brake_action)
+    set_brake_lead(0)
+    gc_end_primitive(label)
+    triggers_end(label)
+    if TRACTION_CONTROL: traction_end(label)
+    if PROFILE_STEPS: profile_step(label, start_ms, reason)
+
+line_edge_target = (LINE_BLACK_REFLECTION + LINE_WHITE_REFLECTION) // 2
+
+
+# Edge target from readings taken on the line (black) and next to it (white)
+def calibrate_line_sensor(black, white):
+    global line_edge_target
+    line_edge_target = (black + white) // 2
+
+
+def line_gains(speed):
+    speed = abs(speed)
+    if speed <= LINE_GAINS[0][0]:
+        return LINE_GAINS[0][1:]
+    for i in range(1, len(LINE_GAINS)):
+        high = LINE_GAINS[i]
+        if speed <= high[0]:
+            low = LINE_GAINS[i - 1]
+            share = (speed - low[0]) / (high[0] - low[0])
+            return (low[1] + (high[1] - low[1]) * share,
+                    low[2] + (high[2] - low[2]) * share,
+                    low[3] + (high[3] - low[3]) * share)
+    return LINE_GAINS[-1][1:]
+
+
+# Follow the "left" or "right" edge of a line until follow_for(**kwargs) is
+# False. Gains are positive; the sign for the edge is worked out here. Forward
+# only: reversing puts the sensor behind the wheels and the loop goes unstable.
+async def follow_line(speed,
+                      edge,
+                      brake_action,
+                      follow_for,
+                      kp=None,
+                      ki=None,
+                      kd=None,
+                      sleep_time=0,
+                      sensor_port=LINE_SENSOR_PORT,
+                      triggers=None,
+                      label="follow_line",
+                      **kwargs):
+    start_ms = time.ticks_ms()
+    if speed < 0:
+        raise ValueError("follow_line drives forward only")
+    # gains the caller leaves out come from the speed schedule
+    table_kp, table_ki, table_kd = line_gains(speed)
+    kp = table_kp if kp is None else kp
+    ki = table_ki if ki is None else ki
+    kd = table_kd if kd is None else kd
+    # on the left edge more white means the robot is left of the edge: steer right
+    side = 1 if edge == "left" else -1
+    kp, ki, kd = kp * side, ki * side, kd * side
+    speed = scaled_speed(speed)
+    set_brake_lead(speed)
+    if TURN_LEARNING: turn_learn_settled()
+    if PACING: pace_update()
+    gc_begin_primitive()
+    sensor_ticks_begin()
+    if TRACTION_CONTROL: traction_begin()
+    pending_triggers = triggers_begin(triggers)
+    integral = 0
+    last_error = 0
+    while follow_for(**kwargs):
+        error = read_reflection(sensor_port) - line_edge_target
+        integral += error
+        steering_value = (error * kp) + (integral * ki) + ((error - last_error) * kd)
+        last_error = error
 
-async def pivot_gyro_turn_abs(left_speed=0, right_speed=50, angle=90, stop=False):
-    motor_pair.move_tank(motor_pair.PAIR_1, left_speed, right_speed)
-    wait_for_yaw_abs(angle=angle)
-    if stop: motor_pair.stop(motor_pair.PAIR_1, stop=motor.HOLD)
+        if sleep_time:
+            time.sleep_ms(sleep_time)
+        if pending_triggers:
+            new_speed = run_triggers(pending_triggers)
+            if new_speed is not None:
+                speed = trigger_speed(new_speed, speed)
+                set_brake_lead(speed)
+        move_steering_tank(steering_value, traction_speed(speed) if TRACTION_CONTROL else speed)
+        gc_tick()
+        next_sensor_tick()
+
+    sensor_ticks_end()
+    motor_pair.stop(motor_pair.PAIR_1, stop=brake_action)
+    set_brake_lead(0)
+    gc_end_primitive(label)
+    triggers_end(label)
+    if TRACTION_CONTROL: traction_end(label)
+    if PROFILE_STEPS: profile_step(label, start_ms, "done")
+
+turn_overshoot = {}     # turn key -> [learned overshoot (degrees), samples]
+turn_table_changed = False
+turn_pending = None     # (key, stop angle, clockwise, port, stop time) of the last stop=True turn
+
+
+def turn_key(left_speed, right_speed):
+    # "spin" turns both wheels in opposite directions, "pivot" keeps one still
+    kind = "spin" if left_speed != 0 and right_speed != 0 else "pivot"
+    clockwise = left_speed > right_speed
+    return kind + " " + str(max(abs(left_speed), abs(right_speed))) + " " + ("cw" if clockwise else "ccw")
+
+
+# Where to stop the turn so the robot settles on `angle`. The stop angle never
+# crosses 0 from the target because wait_for_yaw_abs compares magnitudes.
+def turn_stop_angle(key, angle, clockwise):
+    if not TURN_COMPENSATION or key not in turn_overshoot:
+        return angle
+    overshoot = turn_overshoot[key][0]
+    stop_angle = angle - overshoot if clockwise else angle + overshoot
+    if angle != 0 and (stop_angle > 0) != (angle > 0):
+        return 0
+    return stop_angle
+
+
+# Record the heading the last turn settled at. Called when the next step
+# starts, so any time spent on arm moves in between is time the robot does
+# not have to wait for the turn to settle.
+def turn_learn_settled():
+    global turn_pending, turn_table_changed
+    if turn_pending is None:
+        return
+    key, stop_angle, clockwise, moving_port, stop_ms = turn_pending
+    turn_pending = None
+    while abs(motor.velocity(moving_port)) > TURN_SETTLED_SPEED:
+        if time.ticks_diff(time.ticks_ms(), stop_ms) > TURN_SETTLE_MAX_MS:
+            return
+        time.sleep_ms(5)
+    overshoot = get_yaw_value() - stop_angle
+    if overshoot >= 180:
+        overshoot -= 360
+    elif overshoot < -180:
+        overshoot += 360
+    if not clockwise:
+        overshoot = -overshoot
+    # stopping short means wait_for_yaw_abs matched the mirrored angle (-a for a)
+    if overshoot < -1 or overshoot > TURN_MAX_OVERSHOOT:
+        return
+    if key in turn_overshoot:
+        entry = turn_overshoot[key]
+        entry[0] += (overshoot - entry[0]) * TURN_LEARN_RATE
+        entry[1] += 1
+    else:
+        turn_overshoot[key] = [overshoot, 1]
+    turn_table_changed = True
+
+
+def load_turn_table():
+    try:
+        with open(TURN_TABLE_FILE) as table_file:
+            for line in table_file:
+                parts = line.split()
+                if len(parts) == 5:
+                    turn_overshoot[parts[0] + " " + parts[1] + " " + parts[2]] = [float(parts[3]), int(parts[4])]
+    except (OSError, ValueError):
+        pass
+
+
+def save_turn_table():
+    global turn_table_changed
+    if not turn_table_changed:
+        return
+    try:
+        with open(TURN_TABLE_FILE, "w") as table_file:
+            for key in sorted(turn_overshoot):
+                entry = turn_overshoot[key]
+                table_file.write(key + " " + "{:.2f}".format(entry[0]) + " " + str(entry[1]) + "\n")
+        turn_table_changed = False
+    except OSError:
+        print("Could not save " + TURN_TABLE_FILE)
+
+
+def print_turn_table():
+    print("Turn overshoot (deg, samples):")
+    for key in sorted(turn_overshoot):
+        entry = turn_overshoot[key]
+        print("  " + "{:<14}".format(key) + "{:>6.1f}".format(entry[0]) + "{:>5}".format(entry[1]))
+
+
+async def pivot_gyro_turn_abs(left_speed=0, right_speed=50, angle=90, stop=False, label="pivot_gyro_turn_abs"):
+    global turn_pending
+    start_ms = time.ticks_ms()
+    if TURN_LEARNING: turn_learn_settled()
+    if PACING: pace_update()
+    gc_begin_primitive()
+    key = turn_key(left_speed, right_speed)
+    clockwise = left_speed > right_speed
+    stop_angle = turn_stop_angle(key, angle, clockwise)
+    motor_pair.move_tank(motor_pair.PAIR_1, scaled_speed(left_speed), scaled_speed(right_speed))
+    wait_for_yaw_abs(angle=stop_angle)
+    if stop:
+        motor_pair.stop(motor_pair.PAIR_1, stop=motor.HOLD)
+        if TURN_LEARNING: turn_pending = (key, stop_angle, clockwise, port.E if right_speed != 0 else port.A, time.ticks_ms())
+    gc_end_primitive(label)
+    if PROFILE_STEPS: profile_step(label, start_ms, "angle")
 
 
 def get_yaw_angle():
@@ -195,6 +1211,98 @@ async def turnLeft(angle):
     motor_pair.stop(motor_pair.PAIR_1, stop=motor.HOLD)
 
 
+async def move_arm(port_id, degrees, velocity, label="move_arm", **kwargs):
+    # Awaited attachment move (same as `await motor.run_for_degrees(...)`)
+    start_ms = time.ticks_ms()
+    await motor.run_for_degrees(port_id, degrees, scaled_speed(velocity), **kwargs)
+    if PROFILE_STEPS: profile_step(label, start_ms, "done")
+
+
+def start_arm(port_id, degrees, velocity, **kwargs):
+    # Attachment move that runs in parallel with the next steps (same as `motor.run_for_degrees(...)` without await)
+    # Not profiled: its time is spent inside the steps it overlaps
+    return motor.run_for_degrees(port_id, degrees, scaled_speed(velocity), **kwargs)
+
+
+# ATTACHMENT POSITION FUNCTIONS
+#----------------------------------------
+
+arm_start = {port.B: 0, port.C: 0}     # arm positions when the current run started
+
+
+# Where run_number starts an arm, in the frame of the hard stops
+def arm_position(port_id, run_number):
+    return ARM_RUN_START[run_number][0 if port_id == port.B else 1]
+
+
+# Set the arm positions to where run_number starts them (arms set by hand in base)
+def reset_arm_positions(run_number=1):
+    motor.reset_relative_position(port.B, arm_position(port.B, run_number))
+    motor.reset_relative_position(port.C, arm_position(port.C, run_number))
+
+
+# Once before the first run: home the arms in ARM_HOME, take the others as set
+# by hand, and bring every arm to where run_number starts it
+async def home_arms(run_number):
+    reset_arm_positions(run_number)
+    for port_id in (port.B, port.C):
+        if port_id in ARM_HOME:
+            velocity, stop_position = ARM_HOME[port_id]
+            await home_arm(port_id, velocity, home_position=stop_position)
+            start_position = arm_position(port_id, run_number)
+            await move_arm(port_id, start_position - motor.relative_position(port_id), abs(velocity), label="home")
+
+
+# Call when a run starts: the run's poses are measured from where the arms are now
+def capture_arm_starts():
+    for port_id in arm_start:
+        arm_start[port_id] = motor.relative_position(port_id)
+
+
+# Drive an arm into its hard stop and call that position home_position
+async def home_arm(port_id, velocity, home_position=0, stall_ms=200, stall_degrees=2, max_ms=3000):
+    motor.run(port_id, velocity)
+    start_ms = time.ticks_ms()
+    last_progress_ms = start_ms
+    last_position = motor.relative_position(port_id)
+    while time.ticks_diff(time.ticks_ms(), last_progress_ms) < stall_ms:
+        if time.ticks_diff(time.ticks_ms(), start_ms) >= max_ms:
+            break
+        await runloop.sleep_ms(10)
+        position = motor.relative_position(port_id)
+        if abs(position - last_position) >= stall_degrees:
+            last_progress_ms = time.ticks_ms()
+            last_position = position
+    motor.stop(port_id, stop=motor.BRAKE)
+    motor.reset_relative_position(port_id, home_position)
+
+
+# Degrees left to reach a pose, 0 if the arm is already there
+def arm_delta(pose):
+    port_id, offset = ARM_POSES[pose]
+    delta = arm_start[port_id] + offset - motor.relative_position(port_id)
+    if abs(delta) <= ARM_POSE_TOLERANCE:
+        return 0
+    return delta
+
+
+# Awaited move to a named pose; only the missing degrees are moved
+async def move_arm_to(pose, velocity, **kwargs):
+    delta = arm_delta(pose)
+    if delta:
+        await move_arm(ARM_POSES[pose][0], delta, abs(velocity), label=pose, **kwargs)
+
+
+# Background move to a named pose (do not await)
+def start_arm_to(pose, velocity, **kwargs):
+    delta = arm_delta(pose)
+    if delta:
+        start_arm(ARM_POSES[pose][0], delta, abs(velocity), **kwargs)
+
+# END ATTACHMENT POSITION FUNCTIONS
+#----------------------------------------
+
+
 def get_time_taken_ms(start_time, end_time):
     return time.ticks_diff(end_time, start_time)
 
@@ -202,193 +1310,520 @@ def get_time_taken_ms(start_time, end_time):
 def format_seconds(ms):
     return "{:.1f}".format(ms / 1000)
 
+
+def format_kb(size):
+    return "{:.1f}".format(size / 1024)
+
+
+def format_volts(mv):
+    if mv <= 0:
+        return "n/a"
+    return "{:.2f}".format(mv / 1000) + " V"
+
 # END UTILITY FUNCTIONS
 #----------------------------------------
 
 
+# PROFILER FUNCTIONS
+#----------------------------------------
+
+# Preallocated so that recording a step never allocates during a run
+profile_labels = [""] * PROFILE_MAX_STEPS
+profile_starts = [0] * PROFILE_MAX_STEPS
+profile_durations = [0] * PROFILE_MAX_STEPS
+profile_reasons = [""] * PROFILE_MAX_STEPS
+profile_count = 0
+profile_run_start_ms = 0
+
+
+def profile_reset():
+    global profile_count, profile_run_start_ms
+    profile_count = 0
+    profile_run_start_ms = time.ticks_ms()
+
+
+# Record one finished step: label, start tick (relative to the run start), duration and why it ended
+def profile_step(label, start_ms, reason):
+    global profile_count
+    i = profile_count
+    if i >= PROFILE_MAX_STEPS:
+        return
+    profile_labels[i] = label
+    profile_starts[i] = time.ticks_diff(start_ms, profile_run_start_ms)
+    profile_durations[i] = time.ticks_diff(time.ticks_ms(), start_ms)
+    profile_reasons[i] = reason
+    profile_count = i + 1
+
+
+def print_profile(run_number):
+    order = sorted(range(profile_count), key=lambda i: -profile_durations[i])
+    total_ms = 0
+    for i in range(profile_count):
+        total_ms += profile_durations[i]
+    print("Run " + str(run_number) + " steps (slowest first):")
+    print("  #  step                          start    time  end reason")
+    for i in order:
+        print("{:>3}  {:<28} {:>7} {:>7}  {}".format(i, profile_labels[i], profile_starts[i], profile_durations[i], profile_reasons[i]))
+    print("Profiled steps total " + format_seconds(total_ms) + " s in " + str(profile_count) + " steps")
+
+# END PROFILER FUNCTIONS
+#----------------------------------------
+
+
+# MEMORY FUNCTIONS
+#----------------------------------------
+
+gc_start_alloc = 0
+gc_ticks = 0
+gc_forced = 0
+heap_high_water = 0
+
+
+# Call at the start of a drive / turn primitive
+def gc_begin_primitive():
+    global gc_start_alloc, gc_ticks, gc_forced
+    if not GC_CONTROL:
+        return
+    # never start a primitive with the heap already low: it cannot collect on its own
+    if gc.mem_free() < GC_RESERVE_BYTES:
+        gc.collect()
+    gc.disable()
+    gc_ticks = 0
+    gc_forced = 0
+    gc_start_alloc = gc.mem_alloc()
+
+
+# Call once per control tick inside a primitive
+def gc_tick():
+    global gc_ticks, gc_forced
+    if not GC_CONTROL:
+        return
+    gc_ticks += 1
+    if gc_ticks >= GC_CHECK_TICKS:
+        gc_ticks = 0
+        if gc.mem_free() < GC_RESERVE_BYTES:
+            gc.collect()
+            gc_forced += 1
+
+
+# Call at the end of a drive / turn primitive (after the motors are stopped)
+def gc_end_primitive(label):
+    global heap_high_water
+    if not GC_CONTROL:
+        return
+    allocated = gc.mem_alloc()
+    gc.enable()
+    if allocated > heap_high_water:
+        heap_high_water = allocated
+    if gc_forced:
+        print("GC warning: " + label + " ran low on heap and collected " + str(gc_forced) + " times")
+    elif allocated - gc_start_alloc > GC_ALLOC_BUDGET_BYTES:
+        print("GC warning: " + label + " allocated " + str(allocated - gc_start_alloc) + " bytes")
+
+
+def heap_run_reset():
+    global heap_high_water
+    heap_high_water = gc.mem_alloc()
+
+
+# Collect at a run boundary and print how much heap is free
+def report_heap(stage):
+    gc.collect()
+    print("Heap free " + format_kb(gc.mem_free()) + " KB " + stage)
+
+# END MEMORY FUNCTIONS
+#----------------------------------------
+
+
+# MATCH PLANNER FUNCTIONS
+#----------------------------------------
+
+def expected_points(run_number):
+    return RUN_POINTS.get(run_number, 0) * RUN_SUCCESS.get(run_number, 1)
+
+
+def transition_time_ms(previous_run, run_number):
+    # the match clock starts with the first run, so it has no transition
+    if previous_run is None:
+        return 0
+    return TRANSITION_MS.get((previous_run, run_number), DEFAULT_TRANSITION_MS)
+
+
+# A required run that is not a candidate was done before this execute() call
+# (a restart from a later slot), so only candidates still to run can block
+def requirements_met(run_number, runs_done, candidates):
+    for required in RUN_REQUIRES.get(run_number, ()):
+        if required in candidates and required not in runs_done:
+            return False
+    return True
+
+
+# Pick the order and subset of the remaining runs with the highest expected score
+# that fits in remaining_ms. Ties go to the shorter plan, then to the candidate order.
+def plan_runs(candidates, runs_done, previous_run, remaining_ms):
+    best = [0, 0, []]
+    sequence = list(runs_done)
+
+    def search(time_left, score, last_run):
+        used_ms = remaining_ms - time_left
+        if score > best[0] or (score == best[0] and used_ms < best[1]):
+            best[0] = score
+            best[1] = used_ms
+            best[2] = sequence[len(runs_done):]
+        for run_number in candidates:
+            if run_number in sequence or not requirements_met(run_number, sequence, candidates):
+                continue
+            cost_ms = transition_time_ms(last_run, run_number) + RUN_TIME_MS.get(run_number, 0)
+            if cost_ms > time_left:
+                continue
+            sequence.append(run_number)
+            search(time_left - cost_ms, score + expected_points(run_number), run_number)
+            sequence.pop()
+
+    search(remaining_ms, 0, previous_run)
+    return best[2], best[0]
+
+
+def recommend_next_run(candidates, runs_done, match_start_ms):
+    remaining_ms = MATCH_TIME_MS
+    if runs_done:
+        remaining_ms = MATCH_TIME_MS - get_time_taken_ms(match_start_ms, time.ticks_ms())
+    previous_run = runs_done[-1] if runs_done else None
+    plan, score = plan_runs(candidates, runs_done, previous_run, remaining_ms)
+    print("Plan with " + format_seconds(remaining_ms) + " s left: " + str(plan) + " expected points " + str(int(score)))
+    if not plan:
+        return None
+    # show the recommended next run on the hub
+    light_matrix.write(str(plan[0]))
+    return plan[0]
+
+
+# Keep the planner tables up to date with what execute measures
+def record_run_time(previous_run, run_number, transition_ms, run_ms):
+    RUN_TIME_MS[run_number] = run_ms
+    if previous_run is not None:
+        TRANSITION_MS[(previous_run, run_number)] = transition_ms
+
+# END MATCH PLANNER FUNCTIONS
+#----------------------------------------
+
+
+# MATCH PACING FUNCTIONS
+#----------------------------------------
+
+pace_deadline_ms = None     # match clock time the current run / transition should be done by
+pace_step_start_ms = 0
+pace_step_budget_ms = 0
+pace_transition = False
+pace_beeped = False
+pace_last_update_ms = 0
+pace_shown = None
+pace_matrix = True
+
+
+def run_budget_ms(run_number):
+    return RUN_BUDGET_MS.get(run_number, RUN_TIME_MS.get(run_number, 0))
+
+
+# Start pacing a run or transition that has budget_ms and must end by deadline_ms.
+# use_matrix=False leaves the light matrix to the match planner.
+def pace_start(deadline_ms, budget_ms, transition=False, use_matrix=True):
+    global pace_deadline_ms, pace_step_start_ms, pace_step_budget_ms, pace_transition, pace_beeped, pace_shown, pace_matrix
+    pace_deadline_ms = deadline_ms
+    pace_step_start_ms = time.ticks_ms()
+    pace_step_budget_ms = budget_ms
+    pace_transition = transition
+    pace_beeped = False
+    pace_shown = None
+    pace_matrix = use_matrix
+    pace_update(force=True)
+
+
+def pace_stop():
+    global pace_deadline_ms
+    pace_deadline_ms = None
+
+
+# Show ahead / behind on the hub. Called at the start of every drive step and
+# while waiting in base; does nothing more often than every PACE_UPDATE_MS.
+def pace_update(force=False):
+    global pace_beeped, pace_last_update_ms, pace_shown
+    if pace_deadline_ms is None:
+        return
+    now = time.ticks_ms()
+    if not force and time.ticks_diff(now, pace_last_update_ms) < PACE_UPDATE_MS:
+        return
+    pace_last_update_ms = now
+    slack_ms = time.ticks_diff(pace_deadline_ms, now)
+    if slack_ms > PACE_MARGIN_MS:
+        status = color.GREEN
+    elif slack_ms >= 0:
+        status = color.YELLOW
+    else:
+        status = color.RED
+    seconds = min(9, abs(slack_ms) // 1000)
+    if (status, seconds) != pace_shown:
+        pace_shown = (status, seconds)
+        light.color(light.POWER, status)
+        if pace_matrix: light_matrix.write(str(seconds))
+    if pace_transition and not pace_beeped and time.ticks_diff(now, pace_step_start_ms) > pace_step_budget_ms:
+        pace_beeped = True
+        sound.beep(PACE_BEEP_HZ, 150, 100)
+
+
+def format_budget(ms, budget_ms):
+    delta_ms = ms - budget_ms
+    return "budget " + format_seconds(budget_ms) + " s (" + ("+" if delta_ms >= 0 else "-") + format_seconds(abs(delta_ms)) + " s)"
+
+# END MATCH PACING FUNCTIONS
+#----------------------------------------
+
+
+# TICK BENCHMARK FUNCTIONS
+#----------------------------------------
+
+benchmark_ticks_left = 0
+
+
+# Stop condition of the benchmark: the distance check of a real drive, for TICK_BENCHMARK_TICKS ticks
+def follow_for_ticks():
+    global benchmark_ticks_left
+    benchmark_ticks_left -= 1
+    follow_for_distance(initial_position=0, distance_to_cover=1000000)
+    return benchmark_ticks_left >= 0
+
+
+# Average microseconds and bytes per control tick of one drive primitive
+async def measure_ticks(primitive, **kwargs):
+    global benchmark_ticks_left
+    benchmark_ticks_left = TICK_BENCHMARK_TICKS
+    gc.collect()
+    gc.disable()
+    start_bytes = gc.mem_alloc()
+    start_us = time.ticks_us()
+    await primitive(speed=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_ticks, label="benchmark", **kwargs)
+    elapsed_us = time.ticks_diff(time.ticks_us(), start_us)
+    allocated = gc.mem_alloc() - start_bytes
+    gc.enable()
+    return elapsed_us / TICK_BENCHMARK_TICKS, allocated / TICK_BENCHMARK_TICKS
+
+
+async def benchmark_ticks():
+    motor_pair.pair(motor_pair.PAIR_1, port.A, port.E)
+    do_init()
+    update_battery_scale()
+    gyro_gains = {"kp": -1, "ki": -0.0002, "kd": -0.2, "target_angle": 0}
+    rows = [
+        ("follow_gyro_angle", follow_gyro_angle, gyro_gains),
+        ("  fixed point", follow_gyro_angle, dict(gyro_gains, fixed_point=True)),
+        ("  speed governor", follow_gyro_angle, dict(gyro_gains, min_speed=0)),
+        ("follow_gyro_angle_stall", follow_gyro_angle_stall, dict(gyro_gains, stall_ms=1000000, check_ms=0)),
+        ("  fixed point", follow_gyro_angle_stall, dict(gyro_gains, stall_ms=1000000, check_ms=0, fixed_point=True)),
+        ("follow_line", follow_line, {"edge": "left"}),
+    ]
+    print("---------------------------------------------------------------------------")
+    print("TICK BENCHMARK: " + str(TICK_BENCHMARK_TICKS) + " ticks each, traction " + str(TRACTION_CONTROL) + ", GC control " + str(GC_CONTROL) + ", fusion " + str(HEADING_FUSION))
+    print("{:<24} {:>10} {:>12} {:>12}".format("primitive", "us/tick", "ticks/s", "bytes/tick"))
+    for name, primitive, kwargs in rows:
+        per_tick_us, per_tick_bytes = await measure_ticks(primitive, **kwargs)
+        rate = "-" if per_tick_us == 0 else str(int(1000000 / per_tick_us))
+        print("{:<24} {:>10.1f} {:>12} {:>12.0f}".format(name, per_tick_us, rate, per_tick_bytes))
+    print("---------------------------------------------------------------------------")
+
+# END TICK BENCHMARK FUNCTIONS
+#----------------------------------------
+
+
 # RUN FUNCTIONS
 #----------------------------------------
 
 async def run_1():
     # Turn right to align with forum
-    await pivot_gyro_turn_abs(left_speed=0, right_speed=-200, angle=4, stop=True)
+    await pivot_gyro_turn_abs(left_speed=0, right_speed=-200, angle=4, stop=True, label="turn to forum")
 
     # Go major distance backwards (fast) to align with the back walls
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-1000, target_angle=4.5, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(75)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(75)), label="back to wall fast")
 
     # Go all the way backwards (slower) to align with the back walls
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=1, ki=0.0002, kd=0.2, speed=-300, target_angle=4.5, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), stall_ms=500, stall_degrees=5, max_ms=1500, label="back to wall square")
 
     # Go forward to prepare turning left
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=300, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(2.5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(2.5)), label="forward to turn")
 
     # (In Parallel) Lower the arm for mineshaft explorer
-    motor.run_for_degrees(port.C, 375, 300)
+    start_arm_to("explorer arm down", 300)
 
     # Turn left to face precious-artifact
-    await pivot_gyro_turn_abs(left_speed=-100, right_speed=100, angle=-90, stop=True)
+    await pivot_gyro_turn_abs(left_speed=-100, right_speed=100, angle=-90, stop=True, label="turn to artifact")
 
     # Go forward to make contact with precious-artifact
     # Using raw movement to avoid gyro interaction
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=125, target_angle=-90, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(5)), label="approach artifact")
 
 
     # Go forward to make contact with precious-artifact
-    await motor_pair.move_for_degrees(motor_pair.PAIR_1, degrees_for_distance(6.25), 0, velocity=75)
+    await motor_pair.move_for_degrees(motor_pair.PAIR_1, degrees_for_distance(6.25), 0, velocity=scaled_speed(75))
 
     # Lift arm slightly to lift precious-artifact - Do it partially to avoid hitting the structure
-    motor.run_for_degrees(port.B, 195, 400)
+    start_arm_to("artifact lift", 400)
 
     # Lift arm to operate "Mineshaft Explorer"
-    await motor.run_for_degrees(port.C, -360, 150)
+    await move_arm_to("explorer lift", 150)
 
     # Go backward slightly to snatch the precious artifact and move away from careful recovery
-    await motor_pair.move_for_degrees(motor_pair.PAIR_1, degrees_for_distance(18.5), 0, velocity=-350)
+    await motor_pair.move_for_degrees(motor_pair.PAIR_1, degrees_for_distance(18.5), 0, velocity=scaled_speed(-350))
 
     # Lift arm to slide precious-artifact
-    motor.run_for_degrees(port.B, 145, 600)
+    start_arm_to("artifact slide", 600)
 
     # Turn right to align with forum
-    await pivot_gyro_turn_abs(left_speed=200, right_speed=-200, angle=-42, stop=True)
+    await pivot_gyro_turn_abs(left_speed=200, right_speed=-200, angle=-42, stop=True, label="turn to forum drop")
 
     # (In Paralell) Lower the arm to drop off precious-artifact
-    motor.run_for_degrees(port.B, -600, 1100)
+    start_arm_to("artifact drop", 1100)
 
     # Go forward to forum for dropping off the precious artifact
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=1000, target_angle=-42, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(22)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(22)), label="forward to forum")
 
     # Lower arm (in opposite direction) to operate top soil - in parallel
-    motor.run_for_degrees(port.C, -360, 400)
+    start_arm_to("topsoil scoop", 400)
 
     time.sleep(0.1)
     # Go backwards to get away from forum
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-800, target_angle=-42, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(13)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(13)), label="back from forum")
 
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-300, target_angle=-45, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(12.5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(12.5)), label="back to topsoil")
 
     # Lift arm to pick up the top soil - Do this in two stages to avoid throwing away the piece
-    await motor.run_for_degrees(port.C, 90, 100, acceleration=7000)
-    await motor.run_for_degrees(port.C, 125, 100, acceleration=1100)
+    await move_arm_to("topsoil lift", 100, acceleration=7000)
+    await move_arm_to("topsoil carry", 100, acceleration=1100)
 
     # Move slightly forward to avoid hitting map-reveal mission while turning
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=500, target_angle=-45, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(3)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(3)), label="clear map reveal")
 
     # Turn right to face the base
-    await pivot_gyro_turn_abs(left_speed=300, right_speed=-300, angle=5, stop=True)
+    await pivot_gyro_turn_abs(left_speed=300, right_speed=-300, angle=5, stop=True, label="turn to base")
 
     # Go forward to the base
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=1100, target_angle=5, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(70)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(70)), label="forward to base")
 
 async def run_2():
+    # # go forward partially to get out of base, snapping the distance to the base line
+    # # (12 cm is not measured yet: check the line and the sensor on the mat first)
+    # motor.reset_relative_position(port.A, 0)
+    # initial_position = abs(motor.relative_position(port.A))
+    # await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=900, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
+    #     initial_position=initial_position, distance_to_cover=(degrees_for_distance(50)), triggers=[at_line(12)], label="out of base")
+
     # go forward partially to get out of base and approach Map Reveal
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=900, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(50)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(50)), label="out of base")
 
     # go forward fully slowly to get out of base and approach Map Reveal and Flick Surface brushing #1
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=700, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(22)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(22)), label="flick brush 1")
 
     # Move backward to Flick the surface brushing brush #2
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-500, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(16)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(16)), label="flick brush 2")
 
     time.sleep(0.25)
 
     # Drop topsoil into forum
-    motor.run_for_degrees(port.C, 260, 200)
+    start_arm_to("topsoil drop", 200)
 
     # Raise Surface Brushing Brush to lift up brush
-    await motor.run_for_degrees(port.B, -1000, 600)
+    await move_arm_to("brush up", 600)
 
     # Raise topsoil arm to prepeare for next mission
-    motor.run_for_degrees(port.C, -260, 500)
+    start_arm_to("topsoil arm up", 500)
 
     # go forward to approach map reveal and get ready to turn
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=500, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(18)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(18)), label="approach map reveal")
 
     # turn left to get in alignment with Map reveal
-    await pivot_gyro_turn_abs(left_speed=-200, right_speed=0, angle=-40, stop=True)
+    await pivot_gyro_turn_abs(left_speed=-200, right_speed=0, angle=-40, stop=True, label="turn to map reveal")
 
     # go forward to complete moving Map Reveal piece 1 partially
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=450, target_angle=-40, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(13)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(13)), label="push map reveal")
 
     # lower the arm to push back top soil piece
-    await motor.run_for_degrees(port.C, 385, 300)
+    await move_arm_to("topsoil push", 300)
 
     # go forward to complete moving Map Reveal piece 1 partially
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-1, ki=-0.0002, kd=-0.2, speed=100, target_angle=-40, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(4)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(4)), stall_ms=500, stall_degrees=5, max_ms=1500, label="push map reveal stall")
 
     # Lift the arm that pushed back top soil piece
-    await motor.run_for_degrees(port.C, -350, 650)
+    await move_arm_to("topsoil arm clear", 650)
 
     # Prepare for brush drop off - Lower surface brush in parallel to prepare for dropoff
-    motor.run_for_degrees(port.B, 200, 700)
+    start_arm_to("brush ready", 700)
 
     # Move backward all the way to move away from Map reveal
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-850, target_angle=-40, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(21)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(21)), label="back from map reveal")
 
     # Turn left to go to the base
-    await pivot_gyro_turn_abs(left_speed=-200, right_speed=200, angle=-150, stop=True)
+    await pivot_gyro_turn_abs(left_speed=-200, right_speed=200, angle=-150, stop=True, label="turn to base")
 
     # go backward to drop surface brush
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-600, target_angle=-150, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(8)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(8)), label="back to drop brush")
 
     # Drop surface brush in forum
-    await motor.run_for_degrees(port.B, 650, 1100)
+    await move_arm_to("brush drop", 1100)
 
     # go forward to go to the base
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=1100, target_angle=-150, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(72)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(72)), label="forward to base")
 
 
 async def run_3():
@@ -396,7 +1831,7 @@ async def run_3():
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=800, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(36.5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(36.5)), label="out of base")
 
     # # go forward to approach salvage operation faster
     # motor.reset_relative_position(port.A, 0)
@@ -408,349 +1843,349 @@ async def run_3():
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-2, ki=-0.0002, kd=-0.2, speed=200, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=10, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=10, max_ms=1500, label="approach salvage")
 
     # 1. go forward geadually increasing speed to approach salvage operation 
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-2, ki=-0.0002, kd=-0.2, speed=400, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=10, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=10, max_ms=1500, label="salvage push 1")
 
     # 2
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-2, ki=-0.0002, kd=-0.2, speed=600, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500, label="salvage push 2")
 
     # 3.
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-2, ki=-0.0002, kd=-0.2, speed=800, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500, label="salvage push 3")
 
     # 4.
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-2, ki=-0.0002, kd=-0.2, speed=1000, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(10)), stall_ms=500, stall_degrees=5, max_ms=1500, label="salvage push 4")
 
     # move arm down to drop flag inside salvage operation
-    await motor.run_for_degrees(port.C, 300, 400)
+    await move_arm_to("flag down", 400)
 
     # go back to base slower
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-150, target_angle=1, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(14)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(14)), label="back to base slow")
 
     # move flag arm up to release
-    await motor.run_for_degrees(port.C, -300, 400)
+    await move_arm_to("flag up", 400)
 
     # go back to base faster
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-1100, target_angle=1, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(35)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(35)), label="back to base fast")
 
 async def run_4():
     # bring arm down to to start engaging with statue rebuild
-    motor.run_for_degrees(port.B, -2300, 1100)
+    start_arm_to("statue ready", 1100)
 
     # turn left to avoid salvage operation
-    await pivot_gyro_turn_abs(-200, 0, -20, stop=True)
+    await pivot_gyro_turn_abs(-200, 0, -20, stop=True, label="turn past salvage")
 
     # go forward to approach statue rebuild
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-600, target_angle=-20, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), label="approach statue")
 
     # turn right to align with statue rebuild
-    await pivot_gyro_turn_abs(200, -200, 133, stop=True)
+    await pivot_gyro_turn_abs(200, -200, 133, stop=True, label="turn to statue")
 
     # go forward to statue rebuild
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=600, target_angle=133, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(27.5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(27.5)), label="forward to statue")
 
     # bring arm down to to start engaging with statue rebuild
-    await motor.run_for_degrees(port.B, -550, 1100)
+    await move_arm_to("statue lever", 1100)
 
     # turn right to get lever under statue rebuild
-    await pivot_gyro_turn_abs(75, -75, 142, stop=True)
+    await pivot_gyro_turn_abs(75, -75, 142, stop=True, label="turn lever under statue")
 
     # wait to make sure the attachment is latched under statue rebuild
     await runloop.sleep_ms(100)
 
     # bring arm up to lift the statue
-    await motor.run_for_degrees(port.B, 1200, 1100)
+    await move_arm_to("lift statue", 1100)
 
     # go backward to move away from statue rebuild
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-500, target_angle=141, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(9)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(9)), label="back from statue")
 
     # bring arm up to lift the statue
-    motor.run_for_degrees(port.B, 1700, 1100)
+    start_arm_to("statue up", 1100)
 
     # turn right to start approaching tip the scale
-    await pivot_gyro_turn_abs(-150, 150, 0, stop=True)
+    await pivot_gyro_turn_abs(-150, 150, 0, stop=True, label="turn to tip the scale")
 
     # go backward to start aligning with tip the scale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-700, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(37)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(37)), label="back to tip the scale 1")
 
     # go backward to start aligning with tip the scale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-700, target_angle=5, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(39)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(39)), label="back to tip the scale 2")
 
     # turn left to start aligning with tip the scales
-    await pivot_gyro_turn_abs(-150, 150, -86, stop=True)
+    await pivot_gyro_turn_abs(-150, 150, -86, stop=True, label="align tip the scale")
 
     # go forward to get align and latch with tip the scale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=1, ki=0.0002, kd=0.2, speed=-200, target_angle=-86, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)), stall_ms=500, stall_degrees=5, max_ms=1500, label="latch tip the scale")
 
     # go backward to go away from tip the scale and pull the pan
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=200, target_angle=-90, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(12)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(12)), label="pull scale pan")
 
     # align with angler artifact
-    await pivot_gyro_turn_abs(-100, 100, -103, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -103, stop=True, label="align angler artifact")
 
     # turn motor c to lift angler artifact
-    await motor.run_for_degrees(port.C, -500, 250)
+    await move_arm_to("angler lift", 250)
 
     # turn to un-latch with angler artifact gear
-    await pivot_gyro_turn_abs(100, -100, -90, stop=True)
+    await pivot_gyro_turn_abs(100, -100, -90, stop=True, label="unlatch angler gear")
 
     # go forward to get away from angler artifact
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-400, target_angle=-90, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(1)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(1)), label="away from angler")
 
     # turn right to start aligning with what's on sale market ware
-    await pivot_gyro_turn_abs(150, -150, -22, stop=True)
+    await pivot_gyro_turn_abs(150, -150, -22, stop=True, label="turn to market wares")
 
     # go forward to get align and latch with what's on sale market wares
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-800, target_angle=-22, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)), label="latch market wares")
 
     # go backwards to complete what's on sale market ware
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=800, target_angle=-22, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), label="complete market wares")
 
     # turn right to escape what's on sale
-    await pivot_gyro_turn_abs(200, -200, 20, stop=True)
+    await pivot_gyro_turn_abs(200, -200, 20, stop=True, label="turn away from market")
 
     # go backwards to get to base
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-1100, target_angle=20, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(55)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(55)), label="back to base")
 
 async def run_5():
     # go forward to get out of base and approach silo
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=650, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=degrees_for_distance(41.5))
+        initial_position=initial_position, distance_to_cover=degrees_for_distance(41.5), label="out of base to silo")
 
     # bring arm down to hit silo
     for i in range (0, 4):
         i=i+1
         # move hammer down to hit silo lever
-        await motor.run_for_degrees(port.C, 230, 940, acceleration=9000 )
+        await move_arm_to("hammer down", 940, acceleration=9000)
 
         time.sleep_ms(60)
 
         # move up hammer to get ready to hit silo again
-        await motor.run_for_degrees(port.C, 230, -700)
+        await move_arm_to("hammer up", 700)
 
     # bring heavy lifting arm down (1)
-    motor.run_for_degrees(port.B, 1650, -1100)
+    start_arm_to("heavy lifting lower", 1100)
 
     # go forward to approach who lived here
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=400, target_angle=-11, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(30.5)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(30.5)), label="approach who lived here")
 
     # turn left to complete who lived here
-    await pivot_gyro_turn_abs(left_speed=-250, right_speed=250, angle=-30, stop=True)
+    await pivot_gyro_turn_abs(left_speed=-250, right_speed=250, angle=-30, stop=True, label="turn who lived here")
 
     # go backwards to ensure correct alignment to release ore blocks
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-450, target_angle=-30, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(11)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(11)), label="back to align ore")
 
     # turn right to align with forge and release ore blocks
-    await pivot_gyro_turn_abs(left_speed=350, right_speed=-350, angle=45, stop=True)
+    await pivot_gyro_turn_abs(left_speed=350, right_speed=-350, angle=45, stop=True, label="turn to forge")
 
     # bring heavy lifting arm down (2)
-    await motor.run_for_degrees(port.B, 550, -1100)
+    await move_arm_to("heavy lifting down", 1100)
 
     # go forward to engage with heavy lifting
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-1, ki=-0.0002, kd=-0.2, speed=200, target_angle=40, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(9)), stall_degrees=5, stall_ms=500, max_ms=1500)
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(9)), stall_degrees=5, stall_ms=500, max_ms=1500, label="engage heavy lifting")
 
     # bring heavy lifting arm up to pick up heavy lifting
-    await motor.run_for_degrees(port.B, 900, 1000)
-    motor.run_for_degrees(port.B, 1300, 1000)
+    await move_arm_to("heavy lifting hook", 1000)
+    start_arm_to("heavy lifting up", 1000)
 
     # go backwards from forge
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-800, target_angle=40, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(30)), label="back from forge")
 
     # turn left to align to get back to base
-    await pivot_gyro_turn_abs(left_speed=-800, right_speed=800, angle=-18, stop=True)
+    await pivot_gyro_turn_abs(left_speed=-800, right_speed=800, angle=-18, stop=True, label="turn to base")
 
     # go back towards the base
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-1100, target_angle=-18, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(75)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(75)), label="back to base")
 
 async def run_6():
     # turn left to get out of base
-    await pivot_gyro_turn_abs(0, 100, -25, stop=True)
+    await pivot_gyro_turn_abs(0, 100, -25, stop=True, label="turn out of base")
 
     # go forward to align with opposing mineshaft explorer
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=800, target_angle=-25, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(68)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(68)), label="forward to mineshaft 1")
 
     # turn left to escape what's on sale
-    await pivot_gyro_turn_abs(-100, 100, -35, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -35, stop=True, label="turn past market")
 
     # go forward to align with opposing mineshaft explorer
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=700, target_angle=-35, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(5)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(5)), label="forward to mineshaft 2")
 
     # turn left to align with flag dropoff
-    await pivot_gyro_turn_abs(-100, 100, -88, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -88, stop=True, label="turn to flag drop")
 
     # go forward to align with opposing mineshaft explorer
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=500, target_angle=-90, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(28)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(28)), label="forward to mineshaft 3")
 
     # turn right to align with flag dropoff
-    await pivot_gyro_turn_abs(150, -150, 0, stop=True)
+    await pivot_gyro_turn_abs(150, -150, 0, stop=True, label="align flag drop")
 
     # go forward to drop off the flag
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=-1, ki=-0.0002, kd=-0.2, speed=300, target_angle=0, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), stall_ms=500, stall_degrees=5, max_ms=1500, label="drop flag")
 
     # lift opposing team mineshaft
-    await motor.run_for_degrees(port.C, 1000, 1100)
+    await move_arm_to("mineshaft lift", 1100)
 
     # go backward to leave flag
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-300, target_angle=0, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(7)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(7)), label="back from flag")
 
     # turn left to align with whats on sale
-    await pivot_gyro_turn_abs(-75, 75, -43, stop=True)
+    await pivot_gyro_turn_abs(-75, 75, -43, stop=True, label="turn to market roof")
 
     # go backward to push the roof for whats on sale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-500, target_angle=-45, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(20)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(20)), label="push market roof")
 
     # go backward to push the roof for whats on sale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle_stall(kp=1, ki=0.0002, kd=0.2, speed=-700, target_angle=-45, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(11.5)), stall_ms=500, stall_degrees=5, max_ms=1500)
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(11.5)), stall_ms=500, stall_degrees=5, max_ms=1500, label="push market roof stall")
 
     # go forward to leave whats on sale
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=300, target_angle=-45, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-    initial_position=initial_position, distance_to_cover=(degrees_for_distance(7)))
+    initial_position=initial_position, distance_to_cover=(degrees_for_distance(7)), label="away from market")
 
     # turn left to start aligning with forum
-    await pivot_gyro_turn_abs(-100, 100, -90, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -90, stop=True, label="turn to forum 1")
 
     # go forward to start aligning with forum
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=700, target_angle=-90, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(32)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(32)), label="forward to forum 1")
 
     # turn left to start aligning with forum
-    await pivot_gyro_turn_abs(-100, 100, -105, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -105, stop=True, label="turn to forum 2")
 
     # go forward to start aligning with forum
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=700, target_angle=-105, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(16)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(16)), label="forward to forum 2")
 
     # turn left to start aligning with forum
-    await pivot_gyro_turn_abs(-100, 100, -150, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -150, stop=True, label="turn to forum 3")
 
     # go forward to drop pieces in to forum
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=200, target_angle=-150, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(2)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(2)), label="drop pieces in forum")
 
     # drop off opposing team mineshaft in forum
-    motor.run_for_degrees(port.C, -1400, 1100)
+    start_arm_to("mineshaft drop", 1100)
 
     # turn left to start aligning with forum
-    await pivot_gyro_turn_abs(-100, 100, -165, stop=True)
+    await pivot_gyro_turn_abs(-100, 100, -165, stop=True, label="turn at forum 1")
 
     #turn motor b to drop scale pan and heavy lifting onto forum
-    await motor.run_for_degrees(port.B, -1300, 1100)
+    await move_arm_to("scale pan drop", 1100)
 
     # turn left to start aligning with forum
-    await pivot_gyro_turn_abs(100, -100, -147, stop=True)
+    await pivot_gyro_turn_abs(100, -100, -147, stop=True, label="turn at forum 2")
 
     # go backwards from forum
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=1, ki=0.0002, kd=0.2, speed=-400, target_angle=-147, sleep_time=0, brake_action=motor.HOLD, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(3)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(3)), label="back from forum")
 
     # turn right to align with flag drop off
-    await pivot_gyro_turn_abs(150, -150, -85, stop=True)
+    await pivot_gyro_turn_abs(150, -150, -85, stop=True, label="turn to flag")
 
     # go forward to drop flag
     motor.reset_relative_position(port.A, 0)
     initial_position = abs(motor.relative_position(port.A))
     await follow_gyro_angle(kp=-1, ki=-0.0002, kd=-0.2, speed=800, target_angle=-85, sleep_time=0, brake_action=motor.BRAKE, follow_for=follow_for_distance,
-        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)))
+        initial_position=initial_position, distance_to_cover=(degrees_for_distance(15)), label="second flag drop")
 
 # END RUN FUNCTIONS
 #----------------------------------------
@@ -760,7 +2195,7 @@ async def run_6():
 # MAIN EXECUTE FUNCTION
 #----------------------------------------
 
-async def execute(run_numbers=None):
+async def execute(run_numbers=None, plan=False):
 
     runs_to_execute = list()
 
@@ -772,6 +2207,10 @@ async def execute(run_numbers=None):
 
     start_times = [time.ticks_ms() for _ in runs_to_execute]
     end_times = [time.ticks_ms() for _ in runs_to_execute]
+    battery_mvs = [0 for _ in runs_to_execute]
+    heap_peaks = [0 for _ in runs_to_execute]
+    # match clock budget used up by the end of the current run / transition
+    budget_so_far_ms = 0
 
     run_functions_map = {
                             1: run_1,
@@ -788,31 +2227,76 @@ async def execute(run_numbers=None):
     motor_pair.pair(motor_pair.PAIR_1, port.A, port.E)
 
     do_init()
+    if TURN_LEARNING: load_turn_table()
     light_matrix.write("0")
     light.color(light.POWER, color.RED)
-
-    for i, run_number in enumerate(runs_to_execute):
+    report_heap("at start")
+
+    # With plan=True run_numbers are only the candidates: the planner picks
+    # the next run after every run from the time left in the match.
+    candidates = list(runs_to_execute)
+    if plan:
+        runs_to_execute = []
+
+    for i in range(len(candidates)):
+        if plan:
+            run_number = recommend_next_run(candidates, runs_to_execute, start_times[0])
+            if run_number is None:
+                break
+            runs_to_execute.append(run_number)
+        else:
+            run_number = runs_to_execute[i]
+
+        if i == 0:
+            await home_arms(run_number)
+
+        if PACING and i > 0:
+            budget_so_far_ms += TRANSITION_BUDGET_MS
+            pace_start(time.ticks_add(start_times[0], budget_so_far_ms), TRANSITION_BUDGET_MS, transition=True, use_matrix=not plan)
 
         # waiting for left button to be pressed to start the run
-        await runloop.until(is_left_button_pressed)
+        await wait_in_base()
         print("Starting Run: " + str(run_number))
 
         light.color(light.POWER, color.MAGENTA)
         light_matrix.show_image(light_matrix.IMAGE_BUTTERFLY)
 
         start_times[i] = time.ticks_ms()
-        do_init()
-
-        await run_functions_map[run_number]()
+        if PACING:
+            budget_so_far_ms += run_budget_ms(run_number)
+            pace_start(time.ticks_add(start_times[0], budget_so_far_ms), run_budget_ms(run_number))
+        # with the heading reference the heading carries over from the previous run
+        do_init(reset_yaw=(i == 0 or not HEADING_REFERENCE))
+        if HEADING_REFERENCE: print("Heading " + "{:.1f}".format(get_yaw_value()) + " drift " + "{:.3f}".format(yaw_drift_dps) + " deg/s")
+        capture_arm_starts()
+        battery_mvs[i] = update_battery_scale()
+        profile_reset()
+        heap_run_reset()
+
+        try:
+            await run_functions_map[run_number]()
+        finally:
+            # a primitive that raised leaves automatic GC off
+            if GC_CONTROL: gc.enable()
         end_times[i] = time.ticks_ms()
+        pace_stop()
         light.color(light.POWER, color.YELLOW)
+        if TURN_LEARNING:
+            turn_learn_settled()
+            save_turn_table()
+        heap_peaks[i] = heap_high_water
+        report_heap("after run " + str(run_number))
+
+        if PROFILE_STEPS: print_profile(run_number)
 
+        transition_ms = 0
         if i > 0:
             transition_ms = get_time_taken_ms(end_times[i - 1], start_times[i])
-            print("Transition time: " + format_seconds(transition_ms) + " s")
+            print("Transition time: " + format_seconds(transition_ms) + " s, " + format_budget(transition_ms, TRANSITION_BUDGET_MS))
 
         run_ms = get_time_taken_ms(start_times[i], end_times[i])
-        print("Run " + str(run_number) + " time " + format_seconds(run_ms) + " s")
+        print("Run " + str(run_number) + " time " + format_seconds(run_ms) + " s at " + format_volts(battery_mvs[i]) + ", heap peak " + format_kb(heap_peaks[i]) + " KB, " + format_budget(run_ms, run_budget_ms(run_number)))
+        record_run_time(runs_to_execute[i - 1] if i > 0 else None, run_number, transition_ms, run_ms)
         print("---------------------------------------------------------------------------")
 
     # Print execution times
@@ -820,27 +2304,31 @@ async def execute(run_numbers=None):
     print("SUMMARY:")
     total_runs_ms = 0
     total_transitions_ms = 0
+    total_budget_ms = 0
 
     for i, run_number in enumerate(runs_to_execute):
         if i > 0:
             transition_ms = get_time_taken_ms(end_times[i - 1], start_times[i])
-            print("Transition time: " + format_seconds(transition_ms) + " s")
+            print("Transition time: " + format_seconds(transition_ms) + " s, " + format_budget(transition_ms, TRANSITION_BUDGET_MS))
             total_transitions_ms += transition_ms
+            total_budget_ms += TRANSITION_BUDGET_MS
 
         run_ms = get_time_taken_ms(start_times[i], end_times[i])
-        print("Run " + str(run_number) + " time " + format_seconds(run_ms) + " s")
+        print("Run " + str(run_number) + " time " + format_seconds(run_ms) + " s at " + format_volts(battery_mvs[i]) + ", heap peak " + format_kb(heap_peaks[i]) + " KB, " + format_budget(run_ms, run_budget_ms(run_number)))
         total_runs_ms += run_ms
+        total_budget_ms += run_budget_ms(run_number)
 
     print("***************************************************************************")
 
     print("TOTAL RUN TIME = " + format_seconds(total_runs_ms) + " s")
     print("TOTAL TRANSITIONS TIME = " + format_seconds(total_transitions_ms) + " s")
-    print("TOTAL TIME = " + format_seconds(total_transitions_ms + total_runs_ms) + " s")
+    print("TOTAL TIME = " + format_seconds(total_transitions_ms + total_runs_ms) + " s, " + format_budget(total_transitions_ms + total_runs_ms, total_budget_ms))
 
     # This is the full clock elapsed time from the first run start
     # to the last run end. It should match TOTAL TIME except for rounding.
-    actual_total_ms = get_time_taken_ms(start_times[0], end_times[-1])
+    actual_total_ms = get_time_taken_ms(start_times[0], end_times[len(runs_to_execute) - 1])
     print("ACTUAL TOTAL ELAPSED TIME = " + format_seconds(actual_total_ms) + " s")
+    if TURN_LEARNING: print_turn_table()
 
     print("***************************************************************************")
 
@@ -867,3 +2355,9 @@ runloop.run(execute([1, 2, 3, 4, 5, 6]))
 
 # SLOT 5 - Run 6
 # runloop.run(execute([6]))
+
+# SLOT 6 - Match planner picks the next run from the time left
+# runloop.run(execute([1, 2, 3, 4, 5, 6], plan=True))
+
+# SLOT 7 - Control tick benchmark (robot on a stand)
+# runloop.run(benchmark_ticks())
@@ -0,0 +1,13 @@
+# Local stand-in for the SPIKE `color` module
+BLACK = 0
+MAGENTA = 1
+PURPLE = 2
+BLUE = 3
+AZURE = 4
+TURQUOISE = 5
+GREEN = 6
+YELLOW = 7
+ORANGE = 8
+RED = 9
+WHITE = 10
+UNKNOWN = -1
@@ -0,0 +1,20 @@
+# Local stand-in for the SPIKE `color_sensor` module
+#
+# The mat is plain (REFLECTION_BACKGROUND) unless the caller gives the world a
+# `mat` function returning the reflection seen by the sensor on a port.
+from world import WORLD
+
+REFLECTION_BACKGROUND = 60
+
+
+def reflection(port):
+    WORLD.charge("color_sensor.reflection")
+    mat = getattr(WORLD, "mat", None)
+    if mat is None:
+        return REFLECTION_BACKGROUND
+    return int(mat(port))
+
+
+def color(port):
+    WORLD.charge("color_sensor.color")
+    return -1
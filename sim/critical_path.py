@@ -0,0 +1,288 @@
+# Critical-path analyzer for the runs in princess.py
+#
+#   python sim/critical_path.py            # all runs
+#   python sim/critical_path.py 1 3        # only run_1 and run_3
+#
+# Every run is replayed on the local SPIKE stand-in. Each primitive the run
+# issues (gyro drives, turns, motor_pair moves, attachment moves on B / C and
+# plain waits) is traced with its start / end time and the resource it uses.
+# The report shows the critical path (everything the run had to wait for) and
+# the attachment moves that could overlap with their neighbours without two
+# steps ever using the same resource at the same time, ranked by time saved.
+import sys
+
+import loader
+import motor
+import motor_pair
+import runloop
+import sim_time
+from world import WORLD, PORT_NAMES
+
+DRIVE = "drive"
+WAIT = "wait"
+
+# drive primitives of princess.py; they block until the robot stops
+DRIVE_PRIMITIVES = ("follow_gyro_angle", "follow_gyro_angle_stall", "follow_line", "pivot_gyro_turn_abs")
+
+
+class Step:
+    def __init__(self, kind, label, resource, line, start_us):
+        self.kind = kind            # "drive", "job" (awaitable hub command) or "wait"
+        self.label = label
+        self.resource = resource
+        self.line = line
+        self.start_us = start_us
+        self.end_us = None
+        self.blocking = True
+        self.jobs = []
+        self.interrupted = False
+
+    def finish(self):
+        if self.jobs:
+            self.end_us = max(job.end_us for job in self.jobs)
+            self.blocking = any(job.awaited for job in self.jobs)
+            self.interrupted = any(job.interrupted for job in self.jobs)
+
+    def duration_us(self):
+        return self.end_us - self.start_us
+
+
+class Tracer:
+    def __init__(self, program):
+        self.program = program
+        self.steps = []
+        self.depth = 0
+        self.saved = []
+
+    def caller_line(self):
+        frame = sys._getframe(1)
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename == self.program.__file__ and code.co_name[4:].isdigit() and code.co_name.startswith("run_"):
+                return frame.f_lineno
+            frame = frame.f_back
+        return 0
+
+    def top_level(self):
+        return self.depth == 0
+
+    def patch(self, owner, name, replacement):
+        self.saved.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def install(self):
+        for name in DRIVE_PRIMITIVES:
+            self.patch(self.program, name, self.wrap_drive(name, getattr(self.program, name)))
+        self.patch(motor, "run_for_degrees", self.wrap_job(motor.run_for_degrees, arm=True))
+        self.patch(motor_pair, "move_for_degrees", self.wrap_job(motor_pair.move_for_degrees, arm=False))
+        self.patch(runloop, "sleep_ms", self.wrap_wait(runloop.sleep_ms, "runloop.sleep_ms", awaitable=True))
+        self.patch(sim_time, "sleep_ms", self.wrap_wait(sim_time.sleep_ms, "time.sleep_ms"))
+        self.patch(sim_time, "sleep", self.wrap_wait(sim_time.sleep, "time.sleep"))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.saved):
+            setattr(owner, name, original)
+        self.saved = []
+
+    def wrap_drive(self, name, primitive):
+        tracer = self
+
+        async def traced(*args, **kwargs):
+            step = None
+            if tracer.top_level():
+                step = Step(DRIVE, describe_drive(name, args, kwargs), DRIVE, tracer.caller_line(), WORLD.now_us)
+                tracer.steps.append(step)
+            tracer.depth += 1
+            try:
+                await primitive(*args, **kwargs)
+            finally:
+                tracer.depth -= 1
+            if step is not None:
+                step.end_us = WORLD.now_us
+
+        return traced
+
+    def wrap_job(self, command, arm):
+        tracer = self
+
+        def traced(*args, **kwargs):
+            first_job = len(WORLD.jobs)
+            awaitable = command(*args, **kwargs)
+            if tracer.top_level():
+                resource = PORT_NAMES[args[0]] if arm else DRIVE
+                name = command.__module__ + "." + command.__name__
+                label = name + "(" + ", ".join(str(arg) for arg in args[1:]) + ")"
+                step = Step("job", label, resource, tracer.caller_line(), WORLD.now_us)
+                step.jobs = WORLD.jobs[first_job:]
+                tracer.steps.append(step)
+            return awaitable
+
+        return traced
+
+    def wrap_wait(self, sleep, name, awaitable=False):
+        tracer = self
+
+        def traced(duration):
+            if not tracer.top_level() or tracer.caller_line() == 0:
+                return sleep(duration)
+            step = Step(WAIT, name + "(" + str(duration) + ")", WAIT, tracer.caller_line(), WORLD.now_us)
+            tracer.steps.append(step)
+            result = sleep(duration)
+            if awaitable:
+                end_us = WORLD.now_us + int(duration * 1000)
+                step.end_us = end_us
+            else:
+                step.end_us = WORLD.now_us
+            return result
+
+        return traced
+
+
+def describe_drive(name, args, kwargs):
+    if name == "pivot_gyro_turn_abs":
+        names = ("left_speed", "right_speed", "angle")
+        values = dict(zip(names, args))
+        values.update(kwargs)
+        return name + "(" + str(values.get("left_speed")) + ", " + str(values.get("right_speed")) + " -> " + str(values.get("angle")) + ")"
+    if name == "follow_line":
+        values = dict(zip(("speed", "edge"), args))
+        values.update(kwargs)
+        return name + "(speed=" + str(values.get("speed")) + ", " + str(values.get("edge")) + " edge)"
+    text = name + "(speed=" + str(kwargs.get("speed")) + ", target=" + str(kwargs.get("target_angle"))
+    if "distance_to_cover" in kwargs:
+        text += ", " + str(kwargs["distance_to_cover"]) + " deg"
+    return text + ")"
+
+
+def trace_run(program, run_function):
+    tracer = Tracer(program)
+    loader.prepare(program, run_number=loader.run_number_of(run_function))
+    start_us = WORLD.now_us
+    tracer.install()
+    try:
+        runloop.run(run_function())
+    finally:
+        tracer.uninstall()
+    run_end_us = WORLD.now_us
+    WORLD.run_until(lambda: all(job.done() for job in WORLD.jobs))
+    for step in tracer.steps:
+        step.finish()
+        step.start_us -= start_us
+        step.end_us -= start_us
+    return tracer.steps, run_end_us - start_us
+
+
+def critical_path(steps):
+    return [step for step in steps if step.blocking]
+
+
+def resource_free_at(steps, index, resource):
+    # when the last step before `index` using `resource` releases it
+    free_us = 0
+    for step in steps[:index]:
+        if step.resource == resource:
+            free_us = max(free_us, step.end_us)
+    return free_us
+
+
+def overlap_candidates(steps):
+    # Only awaitable hub commands can be started without waiting for them;
+    # the gyro drive primitives block until the robot has stopped.
+    candidates = []
+    for index, step in enumerate(steps):
+        if step.kind != "job" or not step.blocking:
+            continue
+
+        # 1. Don't await it: the following steps run while it finishes.
+        window_us = 0
+        last_line = None
+        for later in steps[index + 1:]:
+            if later.resource in (step.resource, WAIT):
+                break
+            if later.blocking:
+                window_us += later.duration_us()
+                last_line = later.line
+                if window_us >= step.duration_us():
+                    break
+        forward_us = min(step.duration_us(), window_us)
+
+        # 2. Issue it earlier: start it during the preceding steps.
+        # Both directions only move as far as needed to hide the whole step.
+        earliest_us = step.start_us
+        first_line = None
+        for earlier in reversed(steps[:index]):
+            if earlier.resource in (step.resource, WAIT):
+                break
+            if earlier.blocking:
+                earliest_us = earlier.start_us
+                first_line = earlier.line
+                if step.start_us - earliest_us >= step.duration_us():
+                    break
+        earliest_us = max(earliest_us, resource_free_at(steps, index, step.resource))
+        backward_us = min(step.duration_us(), step.start_us - earliest_us)
+
+        if forward_us <= 0 and backward_us <= 0:
+            continue
+        if forward_us >= backward_us:
+            advice = "don't await; overlap with steps up to line " + str(last_line)
+            candidates.append((forward_us, step, advice))
+        else:
+            advice = "start it before line " + str(first_line)
+            candidates.append((backward_us, step, advice))
+
+    candidates.sort(key=lambda candidate: -candidate[0])
+    return candidates
+
+
+def ms(us):
+    return "{:7.0f}".format(us / 1000.0)
+
+
+def print_report(run_number, steps, run_us):
+    print("===========================================================================")
+    print("RUN " + str(run_number) + " - " + "{:.2f}".format(run_us / 1000000.0) + " s")
+    print("  start     end     dur  res    line  step")
+    for step in steps:
+        marker = "*" if step.blocking else " "
+        note = "  (interrupted)" if step.interrupted else ""
+        if step.kind == "job" and not step.blocking and step.end_us > run_us:
+            note += "  (outlives the run)"
+        print(" " + ms(step.start_us) + " " + ms(step.end_us) + " " + ms(step.duration_us()) + "  " + marker
+              + "{:<6}".format(step.resource) + "{:>4}".format(step.line) + "  " + step.label + note)
+
+    path = critical_path(steps)
+    path_us = sum(step.duration_us() for step in path)
+    print("Critical path: " + str(len(path)) + " steps, " + "{:.2f}".format(path_us / 1000000.0) + " s"
+          + " (" + "{:.2f}".format((run_us - path_us) / 1000000.0) + " s between steps)")
+
+    candidates = overlap_candidates(steps)
+    if not candidates:
+        print("No attachment move can overlap with its neighbours.")
+    for saved_us, step, advice in candidates:
+        print("  save " + ms(saved_us).strip() + " ms  line " + str(step.line) + "  " + step.label + "  -> " + advice)
+    return candidates
+
+
+def main(argv):
+    program = loader.load_program()
+    runs = loader.run_functions(program)
+    selected = [int(arg) for arg in argv] if argv else sorted(runs)
+
+    everything = []
+    for run_number in selected:
+        steps, run_us = trace_run(program, runs[run_number])
+        for saved_us, step, advice in print_report(run_number, steps, run_us):
+            everything.append((saved_us, run_number, step, advice))
+
+    everything.sort(key=lambda candidate: -candidate[0])
+    print("===========================================================================")
+    print("ALL RUNS - ranked by time saved")
+    total_us = 0
+    for saved_us, run_number, step, advice in everything:
+        total_us += saved_us
+        print("  save " + ms(saved_us).strip() + " ms  run_" + str(run_number) + " line " + str(step.line) + "  " + step.label + "  -> " + advice)
+    print("Upper bound if every overlap is taken: " + "{:.2f}".format(total_us / 1000000.0) + " s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,172 @@
+# Golden command-trace regression harness for the runs in princess.py
+#
+#   python sim/golden_trace.py record          # (re)write sim/golden/run_N.json for every run
+#   python sim/golden_trace.py check           # diff every run against its golden trace
+#   python sim/golden_trace.py check 2 4       # only run_2 and run_4
+#
+# Each run is replayed on the local SPIKE stand-in, which records the ordered
+# stream of hardware commands (motor, motor_pair, motion_sensor, runloop) with
+# their arguments and virtual timestamps. Repeated drive commands from a
+# control loop (one per tick) are folded into a single step that keeps the
+# first and last call. `check` exits with status 1 when a step differs by more
+# than the tolerance for that command.
+import json
+import os
+import sys
+
+import loader
+import runloop
+from world import WORLD
+
+GOLDEN_DIR = os.path.join(loader.SIM_DIR, "golden")
+
+# Hardware commands that end up in the trace (lights and sounds are left out)
+TRACED_PREFIXES = ("motor.", "motor_pair.", "motion_sensor.", "runloop.")
+
+# Commands issued every control tick; consecutive calls become one step
+PER_TICK_COMMANDS = ("motor_pair.move", "motor_pair.move_tank")
+
+# Allowed difference per step: time in ms and every numeric argument
+DEFAULT_TOLERANCE = {"time_ms": 50, "args": 0}
+TOLERANCES = {
+    "motor_pair.move": {"time_ms": 100, "args": 40},
+    "motor_pair.move_tank": {"time_ms": 100, "args": 40},
+    "motor_pair.stop": {"time_ms": 100, "args": 0},
+    "motor.reset_relative_position": {"time_ms": 100, "args": 0},
+    "motor.run_for_degrees": {"time_ms": 100, "args": 5},
+}
+
+
+def tolerance(name):
+    return TOLERANCES.get(name, DEFAULT_TOLERANCE)
+
+
+def plain(value):
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def fold(commands, start_us):
+    steps = []
+    for time_us, name, args, kwargs in commands:
+        if not name.startswith(TRACED_PREFIXES):
+            continue
+        t_ms = (time_us - start_us) // 1000
+        args = [plain(arg) for arg in args]
+        kwargs = dict((key, plain(value)) for key, value in sorted(kwargs.items()))
+        last = steps[-1] if steps else None
+        if name in PER_TICK_COMMANDS and last is not None and last["name"] == name:
+            last["count"] += 1
+            last["end_t"] = t_ms
+            last["last_args"] = args
+            continue
+        step = {"t": t_ms, "name": name, "args": args, "kwargs": kwargs}
+        if name in PER_TICK_COMMANDS:
+            step.update({"count": 1, "end_t": t_ms, "last_args": args})
+        steps.append(step)
+    return steps
+
+
+def trace_run(program, run_function):
+    loader.prepare(program, run_number=loader.run_number_of(run_function))
+    first_command = len(WORLD.commands)
+    start_us = WORLD.now_us
+    runloop.run(run_function())
+    return fold(WORLD.commands[first_command:], start_us)
+
+
+def golden_path(run_number):
+    return os.path.join(GOLDEN_DIR, "run_" + str(run_number) + ".json")
+
+
+def write_golden(run_number, steps):
+    if not os.path.isdir(GOLDEN_DIR):
+        os.makedirs(GOLDEN_DIR)
+    with open(golden_path(run_number), "w") as golden_file:
+        golden_file.write("[\n")
+        golden_file.write(",\n".join(json.dumps(step, sort_keys=True) for step in steps))
+        golden_file.write("\n]\n")
+
+
+def read_golden(run_number):
+    with open(golden_path(run_number)) as golden_file:
+        return json.load(golden_file)
+
+
+def numbers_differ(expected, actual, allowed):
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return abs(expected - actual) > allowed
+    return expected != actual
+
+
+def step_differences(expected, actual):
+    allowed = tolerance(expected["name"])
+    problems = []
+    if abs(expected["t"] - actual["t"]) > allowed["time_ms"]:
+        problems.append("time " + str(expected["t"]) + " -> " + str(actual["t"]) + " ms")
+    if "end_t" in expected and abs(expected["end_t"] - actual.get("end_t", actual["t"])) > allowed["time_ms"]:
+        problems.append("end time " + str(expected["end_t"]) + " -> " + str(actual.get("end_t")) + " ms")
+    for key in ("args", "last_args"):
+        if key not in expected:
+            continue
+        expected_args = expected[key]
+        actual_args = actual.get(key, [])
+        if len(expected_args) != len(actual_args) or any(
+                numbers_differ(e, a, allowed["args"]) for e, a in zip(expected_args, actual_args)):
+            problems.append(key + " " + str(expected_args) + " -> " + str(actual_args))
+    expected_kwargs = expected.get("kwargs", {})
+    actual_kwargs = actual.get("kwargs", {})
+    for key in sorted(set(expected_kwargs) | set(actual_kwargs)):
+        if numbers_differ(expected_kwargs.get(key), actual_kwargs.get(key), allowed["args"]):
+            problems.append(key + " " + str(expected_kwargs.get(key)) + " -> " + str(actual_kwargs.get(key)))
+    return problems
+
+
+def diff_traces(expected_steps, actual_steps):
+    differences = []
+    for index, (expected, actual) in enumerate(zip(expected_steps, actual_steps)):
+        if expected["name"] != actual["name"]:
+            # the command streams no longer line up, later steps would all differ
+            differences.append((index, expected["name"] + " -> " + actual["name"] + " (traces diverge here)"))
+            return differences
+        for problem in step_differences(expected, actual):
+            differences.append((index, expected["name"] + ": " + problem))
+    if len(expected_steps) != len(actual_steps):
+        differences.append((min(len(expected_steps), len(actual_steps)),
+                            "golden has " + str(len(expected_steps)) + " steps, new trace has " + str(len(actual_steps))))
+    return differences
+
+
+def main(argv):
+    if not argv or argv[0] not in ("record", "check"):
+        print("usage: golden_trace.py record|check [run numbers]")
+        return 2
+    program = loader.load_program()
+    runs = loader.run_functions(program)
+    selected = [int(arg) for arg in argv[1:]] if len(argv) > 1 else sorted(runs)
+
+    failed = 0
+    for run_number in selected:
+        steps = trace_run(program, runs[run_number])
+        if argv[0] == "record":
+            write_golden(run_number, steps)
+            print("run_" + str(run_number) + ": recorded " + str(len(steps)) + " steps")
+            continue
+        if not os.path.exists(golden_path(run_number)):
+            print("run_" + str(run_number) + ": no golden trace, run `record` first")
+            failed += 1
+            continue
+        differences = diff_traces(read_golden(run_number), steps)
+        if not differences:
+            print("run_" + str(run_number) + ": OK (" + str(len(steps)) + " steps)")
+            continue
+        failed += 1
+        print("run_" + str(run_number) + ": " + str(len(differences)) + " differences")
+        for index, text in differences:
+            print("  step " + str(index) + ": " + text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
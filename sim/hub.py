@@ -0,0 +1,114 @@
+# Local stand-in for the SPIKE `hub` module (see world.py)
+from world import WORLD
+
+
+class port:
+    A = 0
+    B = 1
+    C = 2
+    D = 3
+    E = 4
+    F = 5
+
+
+class button:
+    LEFT = 1
+    RIGHT = 2
+
+    @staticmethod
+    def pressed(which):
+        WORLD.charge("button.pressed")
+        # only the LEFT (start) button is ever pressed by the stand-in driver
+        if which != button.LEFT:
+            return 0
+        # The driver presses the button `button_delay_ms` after we start waiting for it
+        if WORLD.button_wait_start_us is None:
+            WORLD.button_wait_start_us = WORLD.now_us
+        if WORLD.now_us - WORLD.button_wait_start_us >= WORLD.button_delay_ms * 1000:
+            WORLD.button_wait_start_us = None
+            return 100
+        return 0
+
+
+class motion_sensor:
+    TOP = 0
+    FRONT = 1
+    RIGHT = 2
+    BOTTOM = 3
+    BACK = 4
+    LEFT = 5
+
+    @staticmethod
+    def set_yaw_face(face):
+        WORLD.record("motion_sensor.set_yaw_face", face)
+        return True
+
+    @staticmethod
+    def reset_yaw(angle):
+        WORLD.record("motion_sensor.reset_yaw", angle)
+        # the hub counts yaw counter-clockwise in decidegrees
+        WORLD.reset_yaw(-angle / 10.0)
+
+    @staticmethod
+    def stable():
+        WORLD.charge("motion_sensor.stable")
+        return True
+
+    @staticmethod
+    def tilt_angles():
+        WORLD.charge("motion_sensor.tilt_angles")
+        return (int(round(-WORLD.yaw() * 10)), 0, 0)
+
+    @staticmethod
+    def angular_velocity(raw_unfiltered=False):
+        WORLD.charge("motion_sensor.angular_velocity")
+        return (0, 0, int(round(-WORLD.yaw_rate() * 10)))
+
+
+class light_matrix:
+    IMAGE_HEART = 1
+    IMAGE_HAPPY = 3
+    IMAGE_SAD = 4
+    IMAGE_YES = 6
+    IMAGE_NO = 7
+    IMAGE_BUTTERFLY = 46
+
+    @staticmethod
+    def write(text, intensity=100, time_per_character=500):
+        WORLD.record("light_matrix.write", text)
+
+    @staticmethod
+    def show_image(image):
+        WORLD.record("light_matrix.show_image", image)
+
+    @staticmethod
+    def set_pixel(x, y, intensity):
+        WORLD.record("light_matrix.set_pixel", x, y, intensity)
+
+    @staticmethod
+    def clear():
+        WORLD.record("light_matrix.clear")
+
+
+class light:
+    POWER = 0
+    CONNECT = 1
+
+    @staticmethod
+    def color(light, color):
+        WORLD.record("light.color", light, color)
+
+
+class sound:
+    @staticmethod
+    def beep(freq=440, duration=500, volume=100, **kwargs):
+        WORLD.record("sound.beep", freq, duration)
+        return None
+
+
+def temperature():
+    return 250
+
+
+def battery_voltage():
+    return WORLD.battery_mv
@@ -0,0 +1,85 @@
+# Closed-loop check of follow_line in princess.py on the local SPIKE stand-in
+#
+#   python sim/line_follow_check.py
+#
+# The mat gets one straight black line along the y axis (LINE_WIDTH_CM wide,
+# edges blurred over EDGE_BLUR_CM). The robot starts next to the line, a few
+# degrees off, and follows each edge at every speed in SPEEDS. A case passes
+# if the sensor ends on the edge and the robot points along the line.
+# follow_line drives forward only: a negative speed has to be refused.
+import math
+import sys
+
+import loader
+import runloop
+from world import WORLD
+
+SPEEDS = (150, 400, 800)
+LINE_WIDTH_CM = 2.0
+EDGE_BLUR_CM = 1.0
+SENSOR_AHEAD_CM = 6.0       # color sensor ahead of the wheel axle
+START_OFFSET_CM = 1.0       # sensor start distance from the edge, off the line
+START_HEADING_DEG = 5.0
+DRIVE_CM = 60
+
+# How far the end of a run may be from the edge / the line direction
+EDGE_TOLERANCE_CM = 0.5
+HEADING_TOLERANCE_DEG = 3.0
+
+
+def sensor_x():
+    return WORLD.x + SENSOR_AHEAD_CM * math.sin(math.radians(WORLD.heading))
+
+
+def line_mat(program):
+    black, white = program.LINE_BLACK_REFLECTION, program.LINE_WHITE_REFLECTION
+
+    def mat(port):
+        outside = abs(sensor_x()) - LINE_WIDTH_CM / 2 + EDGE_BLUR_CM / 2
+        share = min(1.0, max(0.0, outside / EDGE_BLUR_CM))
+        return black + (white - black) * share
+
+    return mat
+
+
+def follow(program, speed, edge):
+    loader.prepare(program)
+    WORLD.mat = line_mat(program)
+    # the left edge is at x = -LINE_WIDTH_CM / 2, the right edge at +LINE_WIDTH_CM / 2
+    side = -1 if edge == "left" else 1
+    WORLD.x = side * (LINE_WIDTH_CM / 2 + START_OFFSET_CM)
+    WORLD.heading = START_HEADING_DEG
+    try:
+        runloop.run(program.follow_line(speed, edge, program.motor.BRAKE, program.follow_for_distance,
+                                        initial_position=0, distance_to_cover=program.degrees_for_distance(DRIVE_CM)))
+    finally:
+        WORLD.mat = None
+    edge_error = abs(sensor_x() - side * LINE_WIDTH_CM / 2)
+    heading_error = abs((WORLD.heading + 180) % 360 - 180)
+    return edge_error, heading_error
+
+
+def main():
+    program = loader.load_program()
+    failures = 0
+    for speed in SPEEDS:
+        for edge in ("left", "right"):
+            edge_error, heading_error = follow(program, speed, edge)
+            ok = edge_error <= EDGE_TOLERANCE_CM and heading_error <= HEADING_TOLERANCE_DEG
+            failures += not ok
+            print("{:>5} {:<5} edge {:5.2f} cm  heading {:5.1f} deg  {}".format(
+                speed, edge, edge_error, heading_error, "OK" if ok else "FAIL"))
+    for edge in ("left", "right"):
+        try:
+            follow(program, -SPEEDS[0], edge)
+            ok = False
+        except ValueError:
+            ok = True
+        failures += not ok
+        print("{:>5} {:<5} reverse refused  {}".format(-SPEEDS[0], edge, "OK" if ok else "FAIL"))
+    print("FAILED " + str(failures) if failures else "all OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
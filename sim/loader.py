@@ -0,0 +1,92 @@
+# Loads a hub program (princess.py by default) on top of the local SPIKE stand-in.
+#
+#   program = load_program()
+#   run_program(program, program.run_2)
+#
+# The hub modules (hub, motor, motor_pair, ...) are the files in this folder.
+# `time` and `gc` are swapped for sim_time / sim_gc while the program is
+# imported so that the program's ticks_ms / sleep_ms use the virtual clock.
+import os
+import sys
+import types
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SIM_DIR)
+DEFAULT_PROGRAM = os.path.join(REPO_DIR, "princess.py")
+
+if SIM_DIR not in sys.path:
+    sys.path.insert(0, SIM_DIR)
+
+import runloop
+import sim_gc
+import sim_time
+import world
+from world import WORLD
+
+# hub-only modules replaced while the program is imported
+STAND_IN_MODULES = {
+    "gc": sim_gc,
+    "time": sim_time,
+}
+
+
+def load_program(path=DEFAULT_PROGRAM, name="princess", run=False):
+    # run=True lets the program's own runloop.run(...) line start it
+    with open(path) as program_file:
+        source = program_file.read()
+
+    module = types.ModuleType(name)
+    module.__file__ = path
+
+    saved = dict((key, sys.modules.get(key)) for key in STAND_IN_MODULES)
+    sys.modules.update(STAND_IN_MODULES)
+    runloop.SUPPRESS_RUN = not run
+    try:
+        exec(compile(source, path, "exec"), module.__dict__)
+    finally:
+        runloop.SUPPRESS_RUN = False
+        for key, value in saved.items():
+            if value is None:
+                sys.modules.pop(key, None)
+            else:
+                sys.modules[key] = value
+    return module
+
+
+def prepare(program, seed=0, run_number=1, arm_positions=None):
+    # Same start-of-run state execute() gives a run on the hub
+    WORLD.reset(seed)
+    program.motor_pair.pair(program.motor_pair.PAIR_1, program.port.A, program.port.E)
+    program.do_init()
+    # per-run setup execute() does after do_init. The arms start where a 1..6
+    # match leaves them, or at arm_positions ({port: degrees}) carried over
+    # from the run before.
+    if arm_positions is not None:
+        for port_id, position in arm_positions.items():
+            program.motor.reset_relative_position(port_id, position)
+    elif hasattr(program, "reset_arm_positions"):
+        program.reset_arm_positions(run_number)
+    if hasattr(program, "capture_arm_starts"):
+        program.capture_arm_starts()
+    if hasattr(program, "update_battery_scale"):
+        program.update_battery_scale()
+
+
+def run_program(program, run_function, seed=0, arm_positions=None):
+    prepare(program, seed, run_number_of(run_function), arm_positions)
+    runloop.run(run_function())
+    # let un-awaited attachment moves finish so their end times are known
+    WORLD.run_until(lambda: all(job.done() for job in WORLD.jobs))
+    return WORLD
+
+
+def run_number_of(run_function):
+    return int(run_function.__name__[4:])
+
+
+def run_functions(program):
+    runs = {}
+    for name in dir(program):
+        if name.startswith("run_") and name[4:].isdigit():
+            runs[int(name[4:])] = getattr(program, name)
+    return runs
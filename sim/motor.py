@@ -0,0 +1,59 @@
+# Local stand-in for the SPIKE `motor` module (see world.py)
+import world
+from world import WORLD, Awaitable, MOTOR_ACCELERATION, STOP_DECELERATION
+
+COAST = world.COAST
+BRAKE = world.BRAKE
+HOLD = world.HOLD
+CONTINUE = world.CONTINUE
+SMART_COAST = world.SMART_COAST
+SMART_BRAKE = world.SMART_BRAKE
+
+READY = 0
+RUNNING = 1
+STALLED = 2
+CANCELLED = 3
+ERROR = 4
+DISCONNECTED = 5
+
+
+def relative_position(port):
+    WORLD.charge("motor.relative_position")
+    return int(round(WORLD.motors[port].position))
+
+
+def reset_relative_position(port, position):
+    WORLD.record("motor.reset_relative_position", port, position)
+    WORLD.motors[port].position = float(position)
+
+
+def absolute_position(port):
+    WORLD.charge("motor.absolute_position")
+    value = int(round(WORLD.motors[port].position)) % 360
+    return value - 360 if value > 180 else value
+
+
+def velocity(port):
+    WORLD.charge("motor.velocity")
+    return int(round(WORLD.motors[port].velocity))
+
+
+def run(port, velocity, *, acceleration=MOTOR_ACCELERATION):
+    WORLD.record("motor.run", port, velocity)
+    WORLD.motors[port].command(velocity, acceleration)
+
+
+def stop(port, *, stop=BRAKE):
+    WORLD.record("motor.stop", port, stop=stop)
+    WORLD.motors[port].command(0, STOP_DECELERATION[stop])
+
+
+def run_for_degrees(port, degrees, velocity, *, stop=BRAKE, acceleration=MOTOR_ACCELERATION, deceleration=MOTOR_ACCELERATION):
+    WORLD.charge("motor.run_for_degrees")
+    WORLD.record("motor.run_for_degrees", port, degrees, velocity, acceleration=acceleration)
+    job = WORLD.start_job(port, degrees, velocity, acceleration, "motor.run_for_degrees")
+
+    def on_await():
+        job.awaited = True
+
+    return Awaitable(job.done, on_await)
@@ -0,0 +1,72 @@
+# Local stand-in for the SPIKE `motor_pair` module (see world.py)
+#
+# Steering is modelled as a symmetric split of the velocity between the two
+# wheels, clipped to MAX_SPEED per wheel like the real motors are.
+from world import WORLD, Awaitable, PAIR_ACCELERATION, STOP_DECELERATION, MAX_SPEED
+
+PAIR_1 = 0
+PAIR_2 = 1
+PAIR_3 = 2
+
+
+def pair(pair, left_motor, right_motor):
+    WORLD.record("motor_pair.pair", pair, left_motor, right_motor)
+    WORLD.pairs[pair] = (left_motor, right_motor)
+
+
+def unpair(pair):
+    WORLD.pairs.pop(pair, None)
+
+
+def steering_to_tank(steering, velocity):
+    steering = max(-100, min(100, steering))
+    correction = velocity * steering / 100.0
+    left = max(-MAX_SPEED, min(MAX_SPEED, velocity + correction))
+    right = max(-MAX_SPEED, min(MAX_SPEED, velocity - correction))
+    return left, right
+
+
+def _command_tank(pair, left_velocity, right_velocity, acceleration):
+    left_port, right_port = WORLD.pairs[pair]
+    # the left motor is mirrored on the robot
+    WORLD.motors[left_port].command(-left_velocity, acceleration)
+    WORLD.motors[right_port].command(right_velocity, acceleration)
+
+
+def move(pair, steering, *, velocity=360, acceleration=PAIR_ACCELERATION):
+    WORLD.charge("motor_pair.move")
+    WORLD.record("motor_pair.move", pair, steering, velocity=velocity)
+    left, right = steering_to_tank(steering, velocity)
+    _command_tank(pair, left, right, acceleration)
+
+
+def move_tank(pair, left_velocity, right_velocity, *, acceleration=PAIR_ACCELERATION):
+    WORLD.charge("motor_pair.move_tank")
+    WORLD.record("motor_pair.move_tank", pair, left_velocity, right_velocity)
+    _command_tank(pair, left_velocity, right_velocity, acceleration)
+
+
+def stop(pair, *, stop=1):
+    WORLD.charge("motor_pair.stop")
+    WORLD.record("motor_pair.stop", pair, stop=stop)
+    left_port, right_port = WORLD.pairs[pair]
+    for port in (left_port, right_port):
+        WORLD.motors[port].command(0, STOP_DECELERATION[stop])
+
+
+def move_for_degrees(pair, degrees, steering, *, velocity=360, stop=1, acceleration=PAIR_ACCELERATION, deceleration=PAIR_ACCELERATION):
+    WORLD.charge("motor_pair.move_for_degrees")
+    WORLD.record("motor_pair.move_for_degrees", pair, degrees, steering, velocity=velocity)
+    left_port, right_port = WORLD.pairs[pair]
+    left, right = steering_to_tank(steering, velocity)
+    fastest = max(abs(left), abs(right), 1)
+    jobs = [
+        WORLD.start_job(left_port, -degrees * abs(left) / fastest, left, acceleration, "motor_pair.move_for_degrees"),
+        WORLD.start_job(right_port, degrees * abs(right) / fastest, right, acceleration, "motor_pair.move_for_degrees"),
+    ]
+
+    def on_await():
+        for job in jobs:
+            job.awaited = True
+
+    return Awaitable(lambda: all(job.done() for job in jobs), on_await)
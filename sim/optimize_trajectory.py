@@ -0,0 +1,221 @@
+# Offline trajectory optimizer for the runs in princess.py
+#
+#   python sim/optimize_trajectory.py          # all runs
+#   python sim/optimize_trajectory.py 1 3      # only run_1 and run_3
+#
+# Every run is replayed on the local SPIKE stand-in. Each drive segment (the
+# gyro drives and turns of princess.py, in the order the run issues them) can
+# be given a different speed, brake action or turn speed. Segments are tried
+# one at a time, keeping the fastest setting for which the robot still ends
+# every segment, and the run, within POSE_TOLERANCE_CM / HEADING_TOLERANCE_DEG
+# of where the unchanged run ends them. The report lists the proposed changes
+# per line of princess.py with the predicted time saved.
+#
+# The stand-in does not model wheel slip or mission models on the mat, so the
+# proposals are a list of segments worth trying on the robot, not a result.
+import inspect
+import sys
+
+import loader
+import runloop
+from critical_path import DRIVE_PRIMITIVES
+from world import WORLD, MAX_SPEED, BRAKE, HOLD, SimTimeout
+
+# Speed multipliers tried for every segment, fastest first
+SPEED_FACTORS = (2.0, 1.5, 1.25, 1.1)
+BRAKE_ACTIONS = (BRAKE, HOLD)
+BRAKE_NAMES = {0: "COAST", 1: "BRAKE", 2: "HOLD", 3: "CONTINUE", 4: "SMART_COAST", 5: "SMART_BRAKE"}
+
+# How far a segment may end from where the unchanged run ends it
+POSE_TOLERANCE_CM = 1.0
+HEADING_TOLERANCE_DEG = 2.0
+
+# A change has to save at least this much to be proposed
+MIN_SAVING_US = 20000
+
+
+class Segment:
+    def __init__(self, name, line, arguments):
+        self.name = name
+        self.line = line
+        self.arguments = arguments
+        self.pose = None
+
+
+class Replayer:
+    # Runs a run with per-segment argument overrides: {segment index: {argument: value}}
+    def __init__(self, program):
+        self.program = program
+        self.overrides = {}
+        self.segments = []
+
+    def caller_line(self):
+        frame = sys._getframe(1)
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename == self.program.__file__ and code.co_name.startswith("run_") and code.co_name[4:].isdigit():
+                return frame.f_lineno
+            frame = frame.f_back
+        return 0
+
+    def wrap(self, name, primitive):
+        replayer = self
+        signature = inspect.signature(primitive)
+
+        async def replayed(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            segment = Segment(name, replayer.caller_line(), dict(bound.arguments))
+            overrides = replayer.overrides.get(len(replayer.segments), {})
+            replayer.segments.append(segment)
+            bound.arguments.update(overrides)
+            await primitive(*bound.args, **bound.kwargs)
+            segment.pose = pose()
+
+        return replayed
+
+    def run(self, run_function):
+        # (run time in us, segments, final pose), run time None if the run never finished
+        self.segments = []
+        saved = [(name, getattr(self.program, name)) for name in DRIVE_PRIMITIVES]
+        for name, primitive in saved:
+            setattr(self.program, name, self.wrap(name, primitive))
+        loader.prepare(self.program, run_number=loader.run_number_of(run_function))
+        start_us = WORLD.now_us
+        try:
+            runloop.run(run_function())
+        except SimTimeout:
+            return None, self.segments, None
+        finally:
+            for name, primitive in saved:
+                setattr(self.program, name, primitive)
+        run_us = WORLD.now_us - start_us
+        return run_us, self.segments, pose()
+
+
+def pose():
+    return (WORLD.x, WORLD.y, WORLD.heading)
+
+
+def pose_error(expected, actual):
+    distance = ((expected[0] - actual[0]) ** 2 + (expected[1] - actual[1]) ** 2) ** 0.5
+    heading = abs((expected[2] - actual[2] + 180) % 360 - 180)
+    return distance, heading
+
+
+def within_tolerance(expected, actual):
+    distance, heading = pose_error(expected, actual)
+    return distance <= POSE_TOLERANCE_CM and heading <= HEADING_TOLERANCE_DEG
+
+
+def speed_candidates(segment):
+    # argument overrides that make the segment faster, fastest first
+    arguments = segment.arguments
+    candidates = []
+    if segment.name == "pivot_gyro_turn_abs":
+        left, right = arguments["left_speed"], arguments["right_speed"]
+        fastest = max(abs(left), abs(right))
+        for factor in SPEED_FACTORS:
+            factor = min(factor, MAX_SPEED / float(fastest)) if fastest else 1.0
+            if factor <= 1.0:
+                continue
+            candidate = {"left_speed": int(left * factor), "right_speed": int(right * factor)}
+            if candidate not in candidates:
+                candidates.append(candidate)
+        return candidates
+    speed = arguments["speed"]
+    for factor in SPEED_FACTORS:
+        new_speed = min(MAX_SPEED, int(abs(speed) * factor))
+        if new_speed <= abs(speed):
+            continue
+        candidate = {"speed": new_speed if speed > 0 else -new_speed}
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+
+def brake_candidates(segment):
+    if "brake_action" not in segment.arguments:
+        return []
+    return [{"brake_action": action} for action in BRAKE_ACTIONS if action != segment.arguments["brake_action"]]
+
+
+def describe_change(segment, change):
+    parts = []
+    for key in sorted(change):
+        before = segment.arguments[key]
+        after = change[key]
+        if key == "brake_action":
+            before, after = BRAKE_NAMES.get(before, before), BRAKE_NAMES.get(after, after)
+        parts.append(key + " " + str(before) + " -> " + str(after))
+    return ", ".join(parts)
+
+
+def optimize_run(program, run_function):
+    replayer = Replayer(program)
+    baseline_us, baseline_segments, baseline_pose = replayer.run(run_function)
+    expected_poses = [segment.pose for segment in baseline_segments]
+
+    def evaluate(overrides):
+        replayer.overrides = overrides
+        run_us, segments, final_pose = replayer.run(run_function)
+        if run_us is None or len(segments) != len(expected_poses):
+            return None
+        if not within_tolerance(baseline_pose, final_pose):
+            return None
+        for expected, segment in zip(expected_poses, segments):
+            if segment.pose is None or not within_tolerance(expected, segment.pose):
+                return None
+        return run_us
+
+    best_us = baseline_us
+    overrides = {}
+    for index, segment in enumerate(baseline_segments):
+        # speed first, then the brake action at the chosen speed
+        for candidates in (speed_candidates(segment), brake_candidates(segment)):
+            best_change = None
+            for change in candidates:
+                trial = dict(overrides)
+                trial[index] = dict(overrides.get(index, {}), **change)
+                run_us = evaluate(trial)
+                if run_us is not None and run_us < best_us - MIN_SAVING_US:
+                    best_us = run_us
+                    best_change = trial[index]
+            if best_change is not None:
+                overrides[index] = best_change
+    replayer.overrides = {}
+
+    changes = []
+    for index in sorted(overrides):
+        segment = baseline_segments[index]
+        changes.append((segment, describe_change(segment, overrides[index])))
+    return baseline_us, best_us, changes
+
+
+def seconds(us):
+    return "{:.2f}".format(us / 1000000.0)
+
+
+def main(argv):
+    program = loader.load_program()
+    runs = loader.run_functions(program)
+    selected = [int(arg) for arg in argv] if argv else sorted(runs)
+
+    total_saved_us = 0
+    for run_number in selected:
+        baseline_us, best_us, changes = optimize_run(program, runs[run_number])
+        saved_us = baseline_us - best_us
+        total_saved_us += saved_us
+        print("===========================================================================")
+        print("RUN " + str(run_number) + " - " + seconds(baseline_us) + " s -> " + seconds(best_us) + " s (save " + seconds(saved_us) + " s)")
+        if not changes:
+            print("  no faster setting keeps every segment within tolerance")
+        for segment, text in changes:
+            print("  line " + "{:>4}".format(segment.line) + "  " + "{:<24}".format(segment.name) + text)
+    print("===========================================================================")
+    print("Predicted saving over " + str(len(selected)) + " runs: " + seconds(total_saved_us) + " s"
+          + " (pose tolerance " + str(POSE_TOLERANCE_CM) + " cm / " + str(HEADING_TOLERANCE_DEG) + " deg)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,22 @@
+# Runs a hub program on the local SPIKE stand-in, exactly as it would start on the hub
+#
+#   python sim/run_hub_program.py benchmark.py
+import os
+import sys
+
+import loader
+from world import WORLD
+
+
+def main(argv):
+    if not argv:
+        print("usage: run_hub_program.py <program.py>")
+        return 2
+    path = os.path.abspath(argv[0])
+    WORLD.reset()
+    loader.load_program(path, os.path.splitext(os.path.basename(path))[0], run=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
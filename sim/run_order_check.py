@@ -0,0 +1,73 @@
+# Checks that the attachment moves of every run in princess.py are the same
+# whatever runs came before it in the match
+#
+#   python sim/run_order_check.py              # the orders in ORDERS
+#   python sim/run_order_check.py 3 2 4 5 6    # one order
+#
+# The arm encoders are never reset between runs on the hub, and
+# execute(..., plan=True) may skip or reorder runs. Every run is first played
+# on its own, then the runs of each order are played back to back with the
+# arms on ports B and C left where the run before stopped them. A run passes
+# if each of its arm moves turns the arm by the same degrees both times.
+import sys
+
+import loader
+import motor
+from world import WORLD
+
+ARM_PORTS = (1, 2)          # port.B, port.C
+ORDERS = (
+    (1, 2, 3, 4, 5, 6),
+    (1, 3, 2, 4, 5, 6),
+    (4, 3, 6),
+    (2, 5, 1),
+)
+TOLERANCE_DEG = 2
+
+
+def arm_moves(program, run_number, arm_positions=None):
+    # (port, degrees) of every attachment move, and where the arms end up
+    runs = loader.run_functions(program)
+    # run_program starts from a fresh world, so every command is this run's
+    loader.run_program(program, runs[run_number], arm_positions=arm_positions)
+    moves = []
+    for command in WORLD.commands:
+        name, args = command[1], command[2]
+        if name == "motor.run_for_degrees" and args[0] in ARM_PORTS:
+            moves.append((args[0], args[1] * (1 if args[2] >= 0 else -1)))
+    end_positions = dict((port_id, motor.relative_position(port_id)) for port_id in ARM_PORTS)
+    return moves, end_positions
+
+
+def same_moves(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    for (expected_port, expected_deg), (port_id, degrees) in zip(expected, actual):
+        if expected_port != port_id or abs(expected_deg - degrees) > TOLERANCE_DEG:
+            return False
+    return True
+
+
+def main(argv):
+    program = loader.load_program()
+    orders = [tuple(int(arg) for arg in argv)] if argv else ORDERS
+    alone = {}
+    for run_number in sorted(set(n for order in orders for n in order)):
+        alone[run_number] = arm_moves(program, run_number)[0]
+
+    failures = 0
+    for order in orders:
+        results = []
+        arm_positions = None
+        for run_number in order:
+            moves, arm_positions = arm_moves(program, run_number, arm_positions)
+            ok = same_moves(alone[run_number], moves)
+            failures += not ok
+            results.append(str(run_number) + (" OK" if ok else " FAIL"))
+        print("order " + " ".join(str(n) for n in order) + ": " + ", ".join(results))
+    print("FAILED " + str(failures) if failures else "all OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
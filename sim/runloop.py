@@ -0,0 +1,37 @@
+# Local stand-in for the SPIKE `runloop` module
+from world import WORLD, Awaitable
+
+# loader.py sets this while it imports a hub program, so the program's own
+# `runloop.run(...)` line at the bottom of the file does not start anything.
+SUPPRESS_RUN = False
+
+
+def run(*coroutines):
+    if SUPPRESS_RUN:
+        for coroutine in coroutines:
+            coroutine.close()
+        return
+    for coroutine in coroutines:
+        try:
+            coroutine.send(None)
+        except StopIteration:
+            pass
+        else:
+            raise RuntimeError("stand-in runloop can only run straight-line coroutines")
+
+
+def sleep_ms(duration):
+    WORLD.record("runloop.sleep_ms", duration)
+    end_us = WORLD.now_us + int(duration) * 1000
+    return Awaitable(lambda: WORLD.now_us >= end_us)
+
+
+def until(function, timeout=0):
+    start_us = WORLD.now_us
+
+    def condition():
+        if timeout and WORLD.now_us - start_us >= timeout * 1000:
+            return True
+        return function()
+
+    return Awaitable(condition)
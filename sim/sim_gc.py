@@ -0,0 +1,43 @@
+# Local stand-in for MicroPython's `gc` module
+#
+# CPython cannot tell how much a MicroPython heap would hold, so the heap is a
+# fixed size with a fixed amount in use. Collections cost virtual time.
+from world import WORLD
+
+HEAP_SIZE = 200 * 1024
+HEAP_IN_USE = 24 * 1024
+
+enabled = True
+
+
+def collect():
+    WORLD.charge("gc.collect")
+    return 0
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def isenabled():
+    return enabled
+
+
+def mem_alloc():
+    WORLD.charge("gc.mem_alloc")
+    return HEAP_IN_USE
+
+
+def mem_free():
+    WORLD.charge("gc.mem_free")
+    return HEAP_SIZE - HEAP_IN_USE
+
+
+def threshold(amount=None):
+    return -1
@@ -0,0 +1,34 @@
+# Local stand-in for MicroPython's `time` module, driven by the virtual clock
+from world import WORLD
+
+
+def ticks_ms():
+    return WORLD.now_us // 1000
+
+
+def ticks_us():
+    return WORLD.now_us
+
+
+def ticks_diff(end, start):
+    return end - start
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def sleep_ms(ms):
+    WORLD.advance_us(int(ms) * 1000)
+
+
+def sleep_us(us):
+    WORLD.advance_us(int(us))
+
+
+def sleep(seconds):
+    WORLD.advance_us(int(seconds * 1000000))
+
+
+def time():
+    return WORLD.now_us // 1000000
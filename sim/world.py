@@ -0,0 +1,318 @@
+# Virtual robot shared by the local SPIKE stand-in modules (hub, motor, motor_pair, ...)
+#
+# Everything runs on a virtual clock. Every hub API call costs a little bit of
+# virtual time (CALL_COST_US) so busy control loops make progress, and the
+# physics below is integrated whenever the clock moves.
+#
+# The model is deliberately simple: motors ramp to their commanded velocity,
+# the drive base is a differential drive with WHEEL_CIRCUMFERENCE / TRACK_WIDTH,
+# and the gyro reads the true heading (plus optional drift and noise).
+# Wheels grip perfectly unless `traction` gives a port the most acceleration
+# (deg/s^2) its wheel can put on the mat; beyond that the wheel spins.
+
+import math
+import random
+
+
+# CONSTANTS
+#----------------------------------------
+
+PORT_NAMES = "ABCDEF"
+
+# Motor stop actions (same values as the SPIKE motor module)
+COAST = 0
+BRAKE = 1
+HOLD = 2
+CONTINUE = 3
+SMART_COAST = 4
+SMART_BRAKE = 5
+
+WHEEL_CIRCUMFERENCE = 19.6      # cm, must match princess.py
+TRACK_WIDTH = 11.2              # cm between the two drive wheels
+MAX_SPEED = 1110                # deg/s, velocity limit of every motor
+
+MOTOR_ACCELERATION = 1000       # deg/s^2, default of motor.run_for_degrees
+PAIR_ACCELERATION = 4000        # deg/s^2, motor_pair.move / move_tank ramp
+
+# How fast each stop action brings a motor to rest (deg/s^2)
+STOP_DECELERATION = {
+    COAST: 2500,
+    BRAKE: 12000,
+    HOLD: 20000,
+    CONTINUE: 20000,
+    SMART_COAST: 2500,
+    SMART_BRAKE: 12000,
+}
+
+# Virtual time charged for each hub API call (microseconds)
+CALL_COST_US = {
+    "motion_sensor.tilt_angles": 250,
+    "motion_sensor.angular_velocity": 250,
+    "motor.relative_position": 200,
+    "motor.velocity": 200,
+    "motor.run_for_degrees": 400,
+    "motor_pair.move": 350,
+    "motor_pair.move_tank": 350,
+    "motor_pair.stop": 300,
+    "color_sensor.reflection": 300,
+    "color_sensor.color": 300,
+    "gc.collect": 2000,
+    "gc.mem_alloc": 100,
+    "gc.mem_free": 100,
+}
+DEFAULT_CALL_COST_US = 50
+
+PHYSICS_STEP_US = 1000
+
+# END CONSTANTS
+#----------------------------------------
+
+
+class SimTimeout(Exception):
+    pass
+
+
+def sign(value):
+    return -1 if value < 0 else 1
+
+
+class MotorJob:
+    # One motor.run_for_degrees (or half of a motor_pair.move_for_degrees) command
+    def __init__(self, port, degrees, velocity, start_us, label):
+        self.port = port
+        self.degrees = degrees
+        self.velocity = velocity
+        self.remaining = abs(degrees)
+        self.start_us = start_us
+        self.end_us = None
+        self.label = label
+        self.awaited = False
+        self.interrupted = False
+
+    def done(self):
+        return self.end_us is not None
+
+
+class Motor:
+    def __init__(self, port):
+        self.port = port
+        self.position = 0.0         # relative encoder position (degrees)
+        self.velocity = 0.0         # actual velocity (deg/s)
+        self.target_velocity = 0.0  # commanded velocity (deg/s)
+        self.acceleration = MOTOR_ACCELERATION
+        self.deceleration = MOTOR_ACCELERATION
+        self.job = None
+        self.travel = 0.0           # mechanical position, never reset
+        self.stops = None           # (low, high) hard stops in travel degrees, None = free
+
+    def command(self, velocity, acceleration, deceleration=None, job=None):
+        self.target_velocity = max(-MAX_SPEED, min(MAX_SPEED, velocity))
+        self.acceleration = acceleration
+        self.deceleration = deceleration if deceleration else acceleration
+        self.job = job
+
+    def update(self, dt, now_us):
+        target = self.target_velocity
+        if self.job is not None:
+            # slow down in time to finish exactly on the requested degrees
+            reachable = math.sqrt(2 * self.deceleration * self.job.remaining)
+            target = sign(target) * max(20.0, min(abs(target), reachable))
+
+        speeding_up = abs(target) > abs(self.velocity) and sign(target) == sign(self.velocity)
+        rate = self.acceleration if speeding_up or self.velocity == 0 else self.deceleration
+        step = rate * dt
+        delta = target - self.velocity
+        if abs(delta) <= step:
+            self.velocity = target
+        else:
+            self.velocity += step * sign(delta)
+
+        move = self.velocity * dt
+        if self.job is not None:
+            if abs(move) >= self.job.remaining - 0.5:
+                move = sign(move) * self.job.remaining
+                self.job.remaining = 0
+                self.job.end_us = now_us
+                self.job = None
+                self.velocity = 0.0
+                self.target_velocity = 0.0
+            else:
+                self.job.remaining -= abs(move)
+        if self.stops is not None:
+            low, high = self.stops
+            blocked = min(high, max(low, self.travel + move))
+            if blocked != self.travel + move:
+                # stalled on a hard stop: the motor gives up on its command
+                move = blocked - self.travel
+                self.velocity = 0.0
+                self.target_velocity = 0.0
+                if self.job is not None:
+                    self.job.end_us = now_us
+                    self.job = None
+        self.travel += move
+        self.position += move
+        return move
+
+
+class World:
+    def __init__(self):
+        self.reset()
+
+    def reset(self, seed=0):
+        self.now_us = 0
+        self.motors = dict((port, Motor(port)) for port in range(len(PORT_NAMES)))
+        self.pairs = {}
+
+        # pose of the robot on the mat (cm, cm, clockwise-positive degrees)
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+
+        # gyro model
+        self.yaw_offset = 0.0
+        self.gyro_drift_dps = 0.0
+        self.gyro_noise = 0.0
+        self.gyro_bias = 0.0
+        self.random = random.Random(seed)
+
+        self.battery_mv = 8000
+
+        # wheel slip model: port -> grip limit (deg/s^2), ground speed of each wheel
+        self.traction = {}
+        self.ground_velocity = {}
+
+        # operator model: how long the driver takes to press a button
+        self.button_delay_ms = 0
+        self.button_wait_start_us = None
+
+        self.time_limit_us = 600 * 1000 * 1000
+        self.jobs = []
+        self.commands = []
+        self.call_counts = {}
+
+    # CLOCK
+    #----------------------------------------
+
+    def now_ms(self):
+        return self.now_us // 1000
+
+    def advance_us(self, us):
+        end_us = self.now_us + int(us)
+        while self.now_us < end_us:
+            step = min(PHYSICS_STEP_US, end_us - self.now_us)
+            self.now_us += step
+            self.update(step / 1000000.0)
+        if self.now_us > self.time_limit_us:
+            raise SimTimeout("virtual clock passed " + str(self.time_limit_us // 1000000) + " s")
+
+    def charge(self, call_name):
+        self.call_counts[call_name] = self.call_counts.get(call_name, 0) + 1
+        self.advance_us(CALL_COST_US.get(call_name, DEFAULT_CALL_COST_US))
+
+    def run_until(self, condition, poll_us=PHYSICS_STEP_US):
+        while not condition():
+            self.advance_us(poll_us)
+
+    # PHYSICS
+    #----------------------------------------
+
+    def drive_ports(self):
+        if not self.pairs:
+            return None
+        return list(self.pairs.values())[0]
+
+    def update(self, dt):
+        moves = {}
+        for port, motor in self.motors.items():
+            moves[port] = motor.update(dt, self.now_us)
+
+        self.gyro_bias += self.gyro_drift_dps * dt
+
+        drive = self.drive_ports()
+        if drive is None:
+            return
+        left_port, right_port = drive
+        # the left motor is mirrored, so it turns backwards when the robot drives forward
+        left_cm = -self.ground_move(left_port, moves[left_port], dt) / 360.0 * WHEEL_CIRCUMFERENCE
+        right_cm = self.ground_move(right_port, moves[right_port], dt) / 360.0 * WHEEL_CIRCUMFERENCE
+        forward = (left_cm + right_cm) / 2
+        turn = math.degrees((left_cm - right_cm) / TRACK_WIDTH)
+        heading_rad = math.radians(self.heading + turn / 2)
+        self.x += forward * math.sin(heading_rad)
+        self.y += forward * math.cos(heading_rad)
+        self.heading += turn
+
+    def ground_move(self, port, move, dt):
+        # how far the wheel moved the robot: a wheel speeding up or slowing
+        # down faster than its grip allows spins / skids on the mat
+        limit = self.traction.get(port)
+        if limit is None or dt <= 0:
+            return move
+        wheel_velocity = move / dt
+        ground = self.ground_velocity.get(port, 0.0)
+        step = limit * dt
+        if abs(wheel_velocity - ground) <= step:
+            ground = wheel_velocity
+        else:
+            ground += step * sign(wheel_velocity - ground)
+        self.ground_velocity[port] = ground
+        return ground * dt
+
+    # SENSORS
+    #----------------------------------------
+
+    def yaw(self):
+        # clockwise-positive yaw as the hub would report it, wrapped to [-180, 180)
+        value = self.heading + self.gyro_bias - self.yaw_offset
+        if self.gyro_noise:
+            value += self.random.gauss(0, self.gyro_noise)
+        return (value + 180) % 360 - 180
+
+    def reset_yaw(self, angle):
+        self.yaw_offset = self.heading + self.gyro_bias - angle
+
+    def yaw_rate(self):
+        drive = self.drive_ports()
+        if drive is None:
+            return 0.0
+        left_port, right_port = drive
+        left = -self.ground_velocity.get(left_port, self.motors[left_port].velocity) / 360.0 * WHEEL_CIRCUMFERENCE
+        right = self.ground_velocity.get(right_port, self.motors[right_port].velocity) / 360.0 * WHEEL_CIRCUMFERENCE
+        return math.degrees((left - right) / TRACK_WIDTH) + self.gyro_drift_dps
+
+    # TRACE
+    #----------------------------------------
+
+    def record(self, name, *args, **kwargs):
+        self.commands.append((self.now_us, name, args, kwargs))
+
+    def start_job(self, port, degrees, velocity, acceleration, label):
+        motor = self.motors[port]
+        if motor.job is not None and not motor.job.done():
+            # a new command on a busy port cancels whatever it was doing
+            motor.job.interrupted = True
+            motor.job.end_us = self.now_us
+        direction = sign(degrees) * sign(velocity)
+        job = MotorJob(port, degrees, velocity, self.now_us, label)
+        motor.command(direction * abs(velocity), acceleration, job=job)
+        self.jobs.append(job)
+        return job
+
+
+WORLD = World()
+
+
+class Awaitable:
+    # Awaiting advances the virtual clock until `condition` is true.
+    # Creating it does not block, so un-awaited motor commands keep running
+    # in the background exactly like they do on the hub.
+    def __init__(self, condition, on_await=None):
+        self.condition = condition
+        self.on_await = on_await
+
+    def __await__(self):
+        if self.on_await is not None:
+            self.on_await()
+        WORLD.run_until(self.condition)
+        return None
+        yield